@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Run the display, audio and power actions of a screensaver session, and keep track of how long they take '''
+
+from __future__ import absolute_import, division, unicode_literals
+from kodiutils import TRACER, log, log_error
+from profiler import PROFILER
+
+try:  # Python 3
+    from time import monotonic as timer
+except ImportError:  # Python 2
+    from time import time as timer
+
+# Number of actions that are allowed to run at the same time
+EXECUTOR_WORKERS = 3
+
+# Number of durations kept for every display and power method
+DURATION_SAMPLES = 20
+
+
+class ActionError(Exception):
+    ''' A display or power method failed, the session continues without it '''
+
+
+class Timeline(object):
+    ''' Record when named steps happen, relative to the creation of the timeline '''
+
+    def __init__(self):
+        ''' Initialize timeline '''
+        self.start = timer()
+        self.steps = []
+
+    def mark(self, step):
+        ''' Record a step, in milliseconds since the start '''
+        self.steps.append((step, int((timer() - self.start) * 1000)))
+
+    def __str__(self):
+        ''' Show all steps in the order they happened '''
+        return ', '.join('%s=%dms' % step for step in self.steps)
+
+
+class ActionExecutor(object):
+    ''' Run independent actions in parallel, an action only starts when the actions it runs after have succeeded '''
+
+    def __init__(self, workers=EXECUTOR_WORKERS, budget=None):
+        ''' Initialize executor, actions that take longer than their budget (in seconds) are abandoned '''
+        from threading import Lock, Semaphore
+        self.actions = []
+        self.budget = budget
+        self.lock = Lock()
+        self.slots = Semaphore(workers)
+
+    def add(self, name, function, *args, **kwargs):
+        ''' Add an action, use the after keyword to list the names of the actions it depends on, and budget to override the default '''
+        after = kwargs.pop('after', ())
+        budget = kwargs.pop('budget', self.budget)
+        self.actions.append(dict(name=name, function=function, args=args, kwargs=kwargs, after=after, budget=budget,
+                                 error=None, skipped=False, overrun=False, duration=None))
+
+    def execute(self, action, done):
+        ''' Wait for the action's dependencies and run it in one of the available slots '''
+        for name in action.get('after'):
+            done[name].wait()
+        failed = [name for name in action.get('after') if self.failed(name)]
+        if failed:
+            log(2, "Skipping action '{name}' because '{failed}' did not succeed", name=action.get('name'), failed=', '.join(failed))
+            action['skipped'] = True
+            done[action.get('name')].set()
+            return
+        self.slots.acquire()
+        watchdog = None
+        if action.get('budget'):
+            from threading import Timer
+            watchdog = Timer(action.get('budget'), self.finish, args=(action, done, True))
+            watchdog.daemon = True
+            watchdog.start()
+        action['start'] = timer()
+        try:
+            with TRACER.span('action', action.get('name')), PROFILER.thread():
+                action.get('function')(*action.get('args'), **action.get('kwargs'))
+        except BaseException as exc:  # pylint: disable=broad-except
+            action['error'] = exc
+            if isinstance(exc, Exception) and not isinstance(exc, ActionError):  # Methods log their own failures
+                log_error("Action '{name}' failed: {exc}", name=action.get('name'), exc=exc)
+        finally:
+            if watchdog:
+                watchdog.cancel()
+            self.finish(action, done)
+
+    def finish(self, action, done, overrun=False):
+        ''' Mark an action as done, either when it returns or when the watchdog finds it overran its budget '''
+        with self.lock:
+            if done[action.get('name')].is_set():
+                return
+            action['duration'] = int((timer() - action.get('start')) * 1000)
+            if overrun:
+                action['overrun'] = True
+                log_error("Action '{name}' overran its budget of {budget}s after {duration}ms, continuing without it", **action)
+            self.slots.release()
+            done[action.get('name')].set()
+
+    def failed(self, name):
+        ''' Return whether an action raised an exception or was skipped '''
+        action = self.action(name)
+        return action.get('error') is not None or action.get('skipped')
+
+    def action(self, name):
+        ''' Return an action by its name '''
+        return next(action for action in self.actions if action.get('name') == name)
+
+    def outcome(self):
+        ''' Return 'overrun' when an action overran its budget, 'failed' when an action failed, and 'ok' otherwise '''
+        if any(action.get('overrun') for action in self.actions):
+            return 'overrun'
+        if any(action.get('error') is not None for action in self.actions):
+            return 'failed'
+        return 'ok'
+
+    def run(self):
+        ''' Run all actions, failed actions are only recorded, but an exit (e.g. SystemExit) is re-raised '''
+        from threading import Event, Thread
+        done = dict((action.get('name'), Event()) for action in self.actions)
+        for action in self.actions:
+            thread = Thread(target=self.execute, args=(action, done), name=action.get('name'))
+            thread.daemon = True  # Do not keep Kodi waiting for actions that overran their budget
+            thread.start()
+        for action in self.actions:
+            done[action.get('name')].wait()
+        for action in self.actions:
+            if action.get('error') is not None and not action.get('overrun') and not isinstance(action.get('error'), Exception):
+                raise action.get('error')
+
+
+class DurationStats(object):
+    ''' Keep the most recent durations of display and power methods, stored in the add-on profile '''
+
+    def __init__(self, path):
+        ''' Load previously recorded durations '''
+        from json import load
+        self.path = path
+        self.changed = False
+        try:
+            with open(path) as fdesc:
+                self.durations = load(fdesc)
+        except (IOError, OSError, ValueError):
+            self.durations = {}
+
+    def add(self, method, action, duration):
+        ''' Record the duration (in milliseconds) of a method's off or on action '''
+        if duration is None:
+            return
+        durations = self.durations.setdefault(method, {}).setdefault(action, [])
+        durations.append(duration)
+        del durations[:-DURATION_SAMPLES]
+        self.changed = True
+        log(3, "Method '{method}' took {duration}ms to turn {action}, p50={p50}ms p95={p95}ms", method=method, action=action,
+            duration=duration, p50=self.percentile(method, action, 50), p95=self.percentile(method, action, 95))
+
+    def percentile(self, method, action, percent):
+        ''' Return a percentile of the recorded durations, or None when nothing was recorded '''
+        durations = sorted(self.durations.get(method, {}).get(action, []))
+        if not durations:
+            return None
+        return durations[min(len(durations) - 1, int(len(durations) * percent / 100))]
+
+    def save(self):
+        ''' Write the durations to the add-on profile, if anything was added '''
+        from json import dump
+        if not self.changed:
+            return
+        with open(self.path, 'w') as fdesc:
+            dump(self.durations, fdesc)
+        self.changed = False
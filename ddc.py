@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Control the power mode of a monitor using DDC/CI over the i2c-dev interface, without spawning ddcutil
+
+I2cBus is a thin layer over an i2c-dev device, DdcMonitor only uses that layer,
+so the protocol can be tested against a fake device.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+import os
+from kodiutils import log
+
+# The i2c-dev devices a monitor can be connected to
+I2C_DEVICES = '/dev/i2c-*'
+
+# See include/uapi/linux/i2c-dev.h
+I2C_SLAVE = 0x0703
+
+# The DDC/CI address of a monitor, and the addresses used in the checksums
+DDC_ADDRESS = 0x37
+DDC_HOST = 0x51
+DDC_DESTINATION = DDC_ADDRESS << 1
+DDC_REPLY_HOST = 0x50
+
+# The address of the EEPROM holding the EDID of a monitor, and how every EDID starts
+EDID_ADDRESS = 0x50
+EDID_HEADER = b'\x00\xff\xff\xff\xff\xff\xff\x00'
+
+DDC_GET_VCP = 0x01
+DDC_GET_VCP_REPLY = 0x02
+DDC_SET_VCP = 0x03
+
+# The VCP power mode feature and its values
+VCP_POWER_MODE = 0xD6
+VCP_POWER_MODES = dict(on=0x01, standby=0x02, suspend=0x03, off=0x04)
+
+# Time (in seconds) a monitor needs after a write before it can handle the next request
+DDC_WRITE_DELAY = 0.05
+
+# Time (in seconds) a monitor needs to prepare a reply
+DDC_REPLY_DELAY = 0.04
+
+
+def checksum(data, initial=DDC_DESTINATION):
+    ''' Return the XOR checksum of a DDC/CI message '''
+    result = initial
+    for byte in bytearray(data):
+        result ^= byte
+    return result
+
+
+def encode(payload):
+    ''' Return a DDC/CI message from the host with its length and checksum '''
+    message = bytearray([DDC_HOST, 0x80 | len(payload)]) + bytearray(payload)
+    message.append(checksum(message))
+    return bytes(message)
+
+
+def decode_vcp_reply(data, code):
+    ''' Return the current value of a VCP feature from a reply to a get request '''
+    data = bytearray(data)
+    if len(data) < 11 or checksum(data[:10], DDC_REPLY_HOST) != data[10]:
+        raise IOError('Invalid DDC/CI reply checksum')
+    if data[2] != DDC_GET_VCP_REPLY or data[4] != code:
+        raise IOError('Unexpected DDC/CI reply')
+    if data[3] != 0:
+        raise IOError('Monitor does not support VCP feature 0x%02X' % code)
+    return data[8] << 8 | data[9]
+
+
+class I2cBus(object):
+    ''' An i2c-dev device that stays open, talking to a single address '''
+
+    def __init__(self, path, address=DDC_ADDRESS):
+        ''' Open the i2c-dev device and select the address '''
+        from fcntl import ioctl
+        self.path = path
+        self.address = address
+        self.fd = os.open(path, os.O_RDWR | getattr(os, 'O_CLOEXEC', 0))
+        try:
+            ioctl(self.fd, I2C_SLAVE, address)
+        except (IOError, OSError):
+            self.close()
+            raise
+
+    def write(self, data):
+        ''' Write a message '''
+        os.write(self.fd, data)
+
+    def read(self, length):
+        ''' Read a message '''
+        return os.read(self.fd, length)
+
+    def close(self):
+        ''' Close the i2c-dev device '''
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class DdcMonitor(object):
+    ''' A monitor whose power mode is controlled using the DDC/CI VCP power mode feature '''
+
+    def __init__(self, bus):
+        ''' Initialize using an open I2cBus (or a fake one) '''
+        from time import sleep
+        self.bus = bus
+        self.sleep = sleep
+
+    def set_vcp(self, code, value):
+        ''' Set a VCP feature '''
+        self.bus.write(encode([DDC_SET_VCP, code, value >> 8, value & 0xFF]))
+        self.sleep(DDC_WRITE_DELAY)
+
+    def get_vcp(self, code):
+        ''' Return the current value of a VCP feature '''
+        self.bus.write(encode([DDC_GET_VCP, code]))
+        self.sleep(DDC_REPLY_DELAY)
+        return decode_vcp_reply(self.bus.read(11), code)
+
+    def set_mode(self, mode):
+        ''' Set the power mode, e.g. 'off' or 'on' '''
+        self.set_vcp(VCP_POWER_MODE, VCP_POWER_MODES.get(mode))
+
+    def mode(self):
+        ''' Return the power mode, or None when it is not a known one '''
+        value = self.get_vcp(VCP_POWER_MODE)
+        return next((name for name, mode in VCP_POWER_MODES.items() if mode == value), None)
+
+    def close(self):
+        ''' Close the i2c-dev device '''
+        self.bus.close()
+
+
+def has_edid(path, bus_class=I2cBus):
+    ''' Return whether a bus has a monitor EDID, so we never send DDC/CI requests to e.g. sensors or a PMIC on other buses '''
+    try:
+        bus = bus_class(path, EDID_ADDRESS)
+    except (IOError, OSError):
+        return False
+    try:
+        bus.write(b'\x00')  # Read from the start of the EDID
+        return bytes(bus.read(len(EDID_HEADER))) == EDID_HEADER
+    except (IOError, OSError):
+        return False
+    finally:
+        bus.close()
+
+
+def find_monitor(cache, pattern=I2C_DEVICES, bus_class=I2cBus):
+    ''' Return the monitor on the bus cached in the add-on profile, or scan the buses with a monitor EDID for one that supports DDC/CI '''
+    from glob import glob
+    from json import dump, load
+    try:
+        with open(cache) as fdesc:
+            cached = load(fdesc)
+    except (IOError, OSError, ValueError):
+        cached = {}
+    paths = sorted(glob(pattern))
+    if cached.get('path') in paths:  # Try the cached bus first
+        paths.remove(cached.get('path'))
+        paths.insert(0, cached.get('path'))
+    for path in paths:
+        if path != cached.get('path') and not has_edid(path, bus_class):
+            log(3, "No monitor EDID on '{path}'", path=path)
+            continue
+        try:
+            monitor = DdcMonitor(bus_class(path, cached.get('address', DDC_ADDRESS)))
+        except (IOError, OSError):
+            continue
+        if path == cached.get('path'):  # Trust the cache, forget_monitor() is used when it turns out wrong
+            return monitor
+        try:
+            monitor.mode()
+        except (IOError, OSError) as exc:  # No monitor, or one that does not support DDC/CI
+            log(3, "No DDC/CI monitor on '{path}': {exc}", path=path, exc=exc)
+            monitor.close()
+            continue
+        log(2, "Found DDC/CI monitor on '{path}'", path=path)
+        try:
+            with open(cache, 'w') as fdesc:
+                dump(dict(path=path, address=DDC_ADDRESS), fdesc)
+        except (IOError, OSError) as exc:
+            log(2, "Cannot write DDC/CI bus to '{path}': {exc}", path=cache, exc=exc)
+        return monitor
+    raise OSError('No DDC/CI monitor found')
+
+
+def forget_monitor(cache):
+    ''' Forget the cached bus, so the next session scans all buses again '''
+    try:
+        os.remove(cache)
+    except OSError:
+        pass
@@ -4,5 +4,12 @@
 ''' This Kodi addon turns off display devices when Kodi goes into screensaver-mode '''
 
 from __future__ import absolute_import, division, unicode_literals
-import screensaver
-screensaver.run()
+from xbmcgui import Window
+
+# Hand off to the resident service when it is ready, so nothing has to be loaded again (see screensaver.TurnOffService)
+if Window(10000).getProperty('screensaver.turnoff.service') == 'ready':
+    from xbmc import executeJSONRPC
+    executeJSONRPC('{"jsonrpc": "2.0", "id": 1, "method": "JSONRPC.NotifyAll", "params": {"sender": "screensaver.turnoff", "message": "activate"}}')
+else:
+    import screensaver
+    screensaver.run()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Control the display by setting the DPMS property of DRM/KMS connectors, for builds without an X server
+
+KmsDevice is a thin layer over the DRM mode-setting ioctls, DrmDpms only uses that layer,
+so it can be tested against a fake device.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+import os
+from ctypes import Structure, addressof, c_char, c_uint32, c_uint64, sizeof
+
+# DPMS property values, see include/uapi/drm/drm_mode.h
+DRM_MODE_DPMS = dict(on=0, standby=1, suspend=2, off=3)
+
+# The DRM devices a display can be connected to
+DRM_DEVICES = '/dev/dri/card*'
+
+DRM_MODE_CONNECTED = 1
+DRM_MODE_OBJECT_CONNECTOR = 0xc0c0c0c0
+DRM_PROP_NAME_LEN = 32
+
+
+class DrmModeCardRes(Structure):
+    ''' struct drm_mode_card_res '''
+    _fields_ = [
+        ('fb_id_ptr', c_uint64), ('crtc_id_ptr', c_uint64), ('connector_id_ptr', c_uint64), ('encoder_id_ptr', c_uint64),
+        ('count_fbs', c_uint32), ('count_crtcs', c_uint32), ('count_connectors', c_uint32), ('count_encoders', c_uint32),
+        ('min_width', c_uint32), ('max_width', c_uint32), ('min_height', c_uint32), ('max_height', c_uint32),
+    ]
+
+
+class DrmModeGetConnector(Structure):
+    ''' struct drm_mode_get_connector '''
+    _fields_ = [
+        ('encoders_ptr', c_uint64), ('modes_ptr', c_uint64), ('props_ptr', c_uint64), ('prop_values_ptr', c_uint64),
+        ('count_modes', c_uint32), ('count_props', c_uint32), ('count_encoders', c_uint32), ('encoder_id', c_uint32),
+        ('connector_id', c_uint32), ('connector_type', c_uint32), ('connector_type_id', c_uint32), ('connection', c_uint32),
+        ('mm_width', c_uint32), ('mm_height', c_uint32), ('subpixel', c_uint32), ('pad', c_uint32),
+    ]
+
+
+class DrmModeModeInfo(Structure):
+    ''' struct drm_mode_modeinfo, only used as room for a single mode '''
+    _fields_ = [('data', c_char * 68)]
+
+
+class DrmModeGetProperty(Structure):
+    ''' struct drm_mode_get_property '''
+    _fields_ = [
+        ('values_ptr', c_uint64), ('enum_blob_ptr', c_uint64), ('prop_id', c_uint32), ('flags', c_uint32),
+        ('name', c_char * DRM_PROP_NAME_LEN), ('count_values', c_uint32), ('count_enum_blobs', c_uint32),
+    ]
+
+
+class DrmModeObjGetProperties(Structure):
+    ''' struct drm_mode_obj_get_properties '''
+    _fields_ = [
+        ('props_ptr', c_uint64), ('prop_values_ptr', c_uint64), ('count_props', c_uint32), ('obj_id', c_uint32), ('obj_type', c_uint32),
+    ]
+
+
+class DrmModeObjSetProperty(Structure):
+    ''' struct drm_mode_obj_set_property '''
+    _fields_ = [('value', c_uint64), ('prop_id', c_uint32), ('obj_id', c_uint32), ('obj_type', c_uint32)]
+
+
+def drm_iowr(number, struct):
+    ''' Return the request number of a DRM ioctl that reads and writes a struct, see include/uapi/drm/drm.h '''
+    return (3 << 30) | (sizeof(struct) << 16) | (ord('d') << 8) | number
+
+
+DRM_IOCTL_MODE_GETRESOURCES = drm_iowr(0xA0, DrmModeCardRes)
+DRM_IOCTL_MODE_GETCONNECTOR = drm_iowr(0xA7, DrmModeGetConnector)
+DRM_IOCTL_MODE_GETPROPERTY = drm_iowr(0xAA, DrmModeGetProperty)
+DRM_IOCTL_MODE_OBJ_GETPROPERTIES = drm_iowr(0xB9, DrmModeObjGetProperties)
+DRM_IOCTL_MODE_OBJ_SETPROPERTY = drm_iowr(0xBA, DrmModeObjSetProperty)
+
+
+class KmsDevice(object):
+    ''' The DRM mode-setting ioctls we need, on a DRM device that stays open '''
+
+    def __init__(self, path):
+        ''' Open the DRM device '''
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | getattr(os, 'O_CLOEXEC', 0))
+
+    def ioctl(self, request, struct):
+        ''' Perform an ioctl that fills in the struct '''
+        from fcntl import ioctl
+        ioctl(self.fd, request, struct, True)
+
+    def connectors(self):
+        ''' Return the ids of all connectors '''
+        resources = DrmModeCardRes()
+        self.ioctl(DRM_IOCTL_MODE_GETRESOURCES, resources)
+        ids = (c_uint32 * resources.count_connectors)()
+        resources = DrmModeCardRes(connector_id_ptr=addressof(ids), count_connectors=len(ids))
+        self.ioctl(DRM_IOCTL_MODE_GETRESOURCES, resources)
+        return list(ids[:resources.count_connectors])
+
+    def connected(self, connector_id):
+        ''' Return whether a display is connected to a connector '''
+        # Asking for at least one mode avoids the kernel probing the connector, which can take a while
+        mode = DrmModeModeInfo()
+        connector = DrmModeGetConnector(connector_id=connector_id, modes_ptr=addressof(mode), count_modes=1)
+        self.ioctl(DRM_IOCTL_MODE_GETCONNECTOR, connector)
+        return connector.connection == DRM_MODE_CONNECTED
+
+    def properties(self, connector_id):
+        ''' Return the property values of a connector by property id '''
+        props = DrmModeObjGetProperties(obj_id=connector_id, obj_type=DRM_MODE_OBJECT_CONNECTOR)
+        self.ioctl(DRM_IOCTL_MODE_OBJ_GETPROPERTIES, props)
+        ids, values = (c_uint32 * props.count_props)(), (c_uint64 * props.count_props)()
+        props = DrmModeObjGetProperties(props_ptr=addressof(ids), prop_values_ptr=addressof(values), count_props=len(ids),
+                                        obj_id=connector_id, obj_type=DRM_MODE_OBJECT_CONNECTOR)
+        self.ioctl(DRM_IOCTL_MODE_OBJ_GETPROPERTIES, props)
+        return dict(zip(ids[:props.count_props], values[:props.count_props]))
+
+    def property_name(self, prop_id):
+        ''' Return the name of a property '''
+        prop = DrmModeGetProperty(prop_id=prop_id)
+        self.ioctl(DRM_IOCTL_MODE_GETPROPERTY, prop)
+        return prop.name.decode('ascii')
+
+    def set_property(self, connector_id, prop_id, value):
+        ''' Set a property of a connector '''
+        self.ioctl(DRM_IOCTL_MODE_OBJ_SETPROPERTY, DrmModeObjSetProperty(value=value, prop_id=prop_id, obj_id=connector_id,
+                                                                         obj_type=DRM_MODE_OBJECT_CONNECTOR))
+
+    def close(self):
+        ''' Close the DRM device '''
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def open_kms_device(pattern=DRM_DEVICES):
+    ''' Open the first DRM device that has connectors, e.g. not the render-only card0 on a Raspberry Pi 4 '''
+    from glob import glob
+    for path in sorted(glob(pattern)):
+        try:
+            device = KmsDevice(path)
+        except OSError:
+            continue
+        try:
+            if device.connectors():
+                return device
+        except (IOError, OSError):  # Not a mode-setting device
+            pass
+        device.close()
+    raise OSError('No DRM device with connectors found')
+
+
+class DrmDpms(object):
+    ''' Switch the DPMS property of all connected connectors, the connectors are found once per session '''
+
+    def __init__(self, device):
+        ''' Initialize using an open KmsDevice (or a fake one) '''
+        self.device = device
+        self.dpms = None
+
+    def connectors(self):
+        ''' Cache and return the DPMS property id of every connected connector '''
+        if self.dpms is None:
+            self.dpms = {}
+            for connector_id in self.device.connectors():
+                if not self.device.connected(connector_id):
+                    continue
+                for prop_id in self.device.properties(connector_id):
+                    if self.device.property_name(prop_id) == 'DPMS':
+                        self.dpms[connector_id] = prop_id
+        return self.dpms
+
+    def set_mode(self, mode):
+        ''' Set all connected connectors to a DPMS mode, e.g. 'off' or 'on' '''
+        for connector_id, prop_id in self.connectors().items():
+            self.device.set_property(connector_id, prop_id, DRM_MODE_DPMS.get(mode))
+
+    def mode(self):
+        ''' Return 'on' when any connected connector is on, otherwise the mode they are in, or None without connectors '''
+        modes = set(self.device.properties(connector_id).get(prop_id) for connector_id, prop_id in self.connectors().items())
+        if not modes:
+            return None
+        if DRM_MODE_DPMS.get('on') in modes:
+            return 'on'
+        return next(name for name, value in DRM_MODE_DPMS.items() if value == max(modes))
+
+    def close(self):
+        ''' Close the DRM device '''
+        self.device.close()
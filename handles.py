@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Display and power methods that keep a device or bus connection open for the whole screensaver session '''
+
+from __future__ import absolute_import, division, unicode_literals
+from actions import ActionError
+from kodiutils import TRACER, addon_profile, log, log_error, notification, to_unicode
+
+try:  # Python 3
+    from time import monotonic as timer
+except ImportError:  # Python 2
+    from time import time as timer
+
+
+def x_display():
+    ''' Cache and return a connection to the X server for the rest of the screensaver session '''
+    if not hasattr(x_display, 'cached'):
+        from xdpms import XDisplay
+        x_display.cached = XDisplay()
+    return getattr(x_display, 'cached')
+
+
+def close_x_display():
+    ''' Close the connection to the X server if it was opened during this session '''
+    if hasattr(x_display, 'cached'):
+        x_display.cached.close()
+        del x_display.cached
+
+
+def set_dpms(mode):
+    ''' Force the display into a DPMS mode using the X11 DPMS extension '''
+    start = timer()
+    try:
+        x_display().force_level(mode)
+    except OSError as exc:
+        log_error('Exception using X11 DPMS: {exc}', exc=exc)
+        notification(message='Exception using X11 DPMS: %s' % exc)
+        raise ActionError('Exception using X11 DPMS: %s' % exc)
+    log(2, "Setting DPMS mode '{mode}' took {latency:.2f}ms", mode=mode, latency=(timer() - start) * 1000)
+
+
+def dpms_state(mode_on):
+    ''' Return whether the display is in its on DPMS mode, or None if the X server cannot tell '''
+    try:
+        return x_display().power_level() == mode_on
+    except OSError:
+        return None
+
+
+def drm_dpms():
+    ''' Cache and return the DRM device for the rest of the screensaver session '''
+    if not hasattr(drm_dpms, 'cached'):
+        from drm import DrmDpms, open_kms_device
+        drm_dpms.cached = DrmDpms(open_kms_device())
+    return getattr(drm_dpms, 'cached')
+
+
+def close_drm():
+    ''' Close the DRM device if it was opened during this session '''
+    if hasattr(drm_dpms, 'cached'):
+        drm_dpms.cached.close()
+        del drm_dpms.cached
+
+
+def set_drm_dpms(mode):
+    ''' Set the DPMS property of all connected DRM connectors '''
+    start = timer()
+    try:
+        drm_dpms().set_mode(mode)
+    except (IOError, OSError) as exc:  # E.g. EACCES when Kodi holds DRM master
+        log_error('Exception using DRM DPMS: {exc}', exc=exc)
+        notification(message='Exception using DRM DPMS: %s' % exc)
+        raise ActionError('Exception using DRM DPMS: %s' % exc)
+    log(2, "Setting DRM DPMS mode '{mode}' took {latency:.2f}ms", mode=mode, latency=(timer() - start) * 1000)
+
+
+def drm_dpms_state(mode_on):
+    ''' Return whether the connected DRM connectors are in their on DPMS mode, or None if it cannot tell '''
+    try:
+        mode = drm_dpms().mode()
+    except (IOError, OSError):
+        return None
+    return None if mode is None else mode == mode_on
+
+
+def ddc_monitor():
+    ''' Cache and return the DDC/CI monitor for the rest of the screensaver session '''
+    if not hasattr(ddc_monitor, 'cached'):
+        import os
+        from ddc import find_monitor
+        ddc_monitor.cached = find_monitor(os.path.join(addon_profile(), 'ddc.json'))
+    return getattr(ddc_monitor, 'cached')
+
+
+def close_ddc():
+    ''' Close the DDC/CI monitor bus if it was opened during this session '''
+    if hasattr(ddc_monitor, 'cached'):
+        ddc_monitor.cached.close()
+        del ddc_monitor.cached
+
+
+def set_ddc_power(mode):
+    ''' Set the power mode of the monitor using DDC/CI '''
+    start = timer()
+    try:
+        ddc_monitor().set_mode(mode)
+    except (IOError, OSError) as exc:
+        import os
+        from ddc import forget_monitor
+        forget_monitor(os.path.join(addon_profile(), 'ddc.json'))
+        close_ddc()
+        log_error('Exception using DDC/CI: {exc}', exc=exc)
+        notification(message='Exception using DDC/CI: %s' % exc)
+        raise ActionError('Exception using DDC/CI: %s' % exc)
+    log(2, "Setting DDC/CI power mode '{mode}' took {latency:.2f}ms", mode=mode, latency=(timer() - start) * 1000)
+
+
+def ddc_power_state(mode_on):
+    ''' Return whether the monitor is in its on power mode, or None if it cannot tell '''
+    try:
+        mode = ddc_monitor().mode()
+    except (IOError, OSError):
+        return None
+    return None if mode is None else mode == mode_on
+
+
+def logind():
+    ''' Cache and return a connection to systemd-logind for the rest of the screensaver session '''
+    if not hasattr(logind, 'cached'):
+        from logind import DBusConnection, Logind
+        logind.cached = Logind(DBusConnection())
+    return getattr(logind, 'cached')
+
+
+def close_logind():
+    ''' Close the connection to systemd-logind if it was opened during this session '''
+    if hasattr(logind, 'cached'):
+        logind.cached.close()
+        del logind.cached
+
+
+def logind_power_off(method):
+    ''' Power off the system by calling systemd-logind directly '''
+    start = timer()
+    try:
+        with TRACER.span('dbus', method):
+            logind().power_off(method)
+    except (MemoryError, OSError) as exc:
+        log_error('Exception calling logind {method}: {exc}', method=method, exc=exc)
+        notification(message='Exception calling logind %s: %s' % (method, exc))
+        raise ActionError('Exception calling logind %s: %s' % (method, exc))
+    log(2, "Calling logind {method} took {latency:.2f}ms", method=method, latency=(timer() - start) * 1000)
+
+
+def close_devices():
+    ''' Close all devices and connections that were opened during this session '''
+    close_ddc()
+    close_drm()
+    close_logind()
+    close_x_display()
+
+
+class SysfsAttribute(object):
+    ''' A sysfs attribute that is opened once and written to directly '''
+
+    def __init__(self, path):
+        ''' Open the sysfs attribute, read-write if possible '''
+        import os
+        self.path = path
+        try:
+            self.fd = os.open(path, os.O_RDWR)
+            self.readable = True
+        except OSError:  # Some attributes are write-only
+            self.fd = os.open(path, os.O_WRONLY)
+            self.readable = False
+
+    def write(self, value):
+        ''' Write a value to the attribute and return the write latency in milliseconds '''
+        import os
+        start = timer()
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, (value + '\n').encode())
+        return (timer() - start) * 1000
+
+    def read(self):
+        ''' Read the current value of the attribute, or None if it is write-only '''
+        import os
+        if not self.readable:
+            return None
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return to_unicode(os.read(self.fd, 4096)).strip()
+
+    def close(self):
+        ''' Close the attribute '''
+        import os
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Run an ordered chain of attempts, hedging against an attempt that fails or stalls
+
+An attempt that cannot tell whether it succeeded (e.g. a display method that cannot report the display state)
+is given the whole budget, after which the next attempt is started anyway. It only wins when no attempt succeeded.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+from kodiutils import log
+
+try:  # Python 3
+    from time import monotonic as timer
+except ImportError:  # Python 2
+    from time import time as timer
+
+
+class Hedge(object):
+    ''' Start the next attempt when the previous one did not succeed within the budget, or race all attempts at once '''
+
+    def __init__(self, budget, race=False):
+        ''' Initialize hedge, the budget is in seconds '''
+        from threading import Condition
+        self.budget = budget
+        self.condition = Condition()
+        self.race = race
+        self.results = {}
+        self.started = []
+        self.successes = []
+        self.unconfirmed = []
+
+    def attempt(self, name, function):
+        ''' Run a single attempt, it succeeds when the function returns a true value, and cannot tell when it returns None '''
+        try:
+            result = function()
+        except BaseException as exc:  # pylint: disable=broad-except
+            log(2, "Attempt '{name}' failed: {exc}", name=name, exc=exc)  # Includes ActionError raised by the display methods
+            result = False
+        with self.condition:
+            self.results[name] = None if result is None else bool(result)
+            if result is None:
+                self.unconfirmed.append(name)
+            elif result:
+                self.successes.append(name)
+            self.condition.notify_all()
+
+    def wait(self, name=None, timeout=None):
+        ''' Wait until an attempt succeeded, the named attempt failed (or all attempts finished), or the timeout passed '''
+        deadline = None if timeout is None else timer() + timeout
+        while not self.successes:
+            if self.results.get(name) is False or (name is None and len(self.results) == len(self.started)):
+                return
+            if deadline is None:
+                self.condition.wait()
+            elif timer() >= deadline:
+                return
+            else:
+                self.condition.wait(deadline - timer())
+
+    def run(self, attempts, timeout=None):
+        ''' Run a list of (name, function) attempts in order, and return the name of the first one that succeeded
+
+        When none succeeded, the first one that could not tell is returned, or None when all of them failed.
+        '''
+        from threading import Thread
+        with self.condition:
+            for index, (name, function) in enumerate(attempts):
+                thread = Thread(target=self.attempt, args=(name, function), name=name)
+                thread.daemon = True
+                thread.start()
+                self.started.append(name)
+                if self.race or index == len(attempts) - 1:
+                    continue
+                self.wait(name, self.budget)
+                if self.successes:
+                    break
+                log(2, "Attempt '{name}' did not succeed within {budget}s, starting the next attempt", name=name, budget=self.budget)
+            self.wait(timeout=timeout)
+            return next(iter(self.successes + sorted(self.unconfirmed, key=self.started.index)), None)
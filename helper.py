@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' A long-lived helper process that runs display commands on behalf of the screensaver
+
+The helper is started once (optionally using su) and listens on a Unix socket.
+It only runs the exact commands it was given on startup, so it cannot be abused
+to run arbitrary commands, even when it runs with elevated privileges.
+
+Every request and response is a single line of JSON:
+
+    {"command": ["vcgencmd", "display_power", "0"], "timeout": 10}
+    {"rc": 0, "output": "display_power=0\n", "duration": 35, "timeout": false}
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# Number of seconds the helper keeps running without any connections
+IDLE_TIMEOUT = 24 * 60 * 60
+
+
+class Helper(object):
+    ''' Listen on a Unix socket and run allowed commands '''
+
+    def __init__(self, path, commands, owner=None):
+        ''' Initialize helper '''
+        self.path = path
+        self.commands = set(tuple(command) for command in commands)
+        self.owner = owner
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = None
+        self.running = False
+
+    def bind(self):
+        ''' Create the Unix socket, only accessible by its owner '''
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            self.server.bind(self.path)
+        finally:
+            os.umask(umask)
+        if self.owner is not None:  # Never follow a symlink someone put in its place in the meantime
+            os.lchown(self.path, self.owner, -1)
+        self.server.listen(1)
+        self.server.settimeout(1)
+
+    def serve(self):
+        ''' Accept connections until we are asked to quit or have been idle for too long '''
+        self.running = True
+        idle = time.time()
+        try:
+            while self.running:
+                try:
+                    conn = self.server.accept()[0]
+                except socket.timeout:
+                    if self.connections:
+                        idle = time.time()
+                    elif time.time() - idle > IDLE_TIMEOUT:
+                        break
+                    continue
+                conn.settimeout(None)
+                thread = threading.Thread(target=self.handle, args=(conn,))
+                thread.daemon = True
+                thread.start()
+        finally:
+            self.server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def handle(self, conn):
+        ''' Handle all requests on a single connection '''
+        with self.lock:
+            self.connections += 1
+        stream = conn.makefile('rb')
+        try:
+            for line in stream:
+                request = json.loads(line.decode('utf-8'))
+                if request.get('quit'):
+                    self.running = False
+                    break
+                response = self.run(request.get('command', []), request.get('timeout'))
+                conn.sendall((json.dumps(response) + '\n').encode('utf-8'))
+        except (IOError, OSError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                self.connections -= 1
+            stream.close()
+            conn.close()
+
+    def run(self, command, timeout=None):
+        ''' Run a single allowed command '''
+        if tuple(command) not in self.commands:
+            return dict(error='Command is not allowed')
+        return execute(command, timeout)
+
+
+def execute(command, timeout=None, **kwargs):
+    ''' Run a command in a new process, killing it when it takes longer than the timeout (in seconds) '''
+    start = time.time()
+    try:
+        cmd = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=False, **kwargs)
+    except OSError as exc:
+        return dict(error=str(exc))
+    killed = []
+
+    def kill():
+        ''' Kill the command once it overran its budget '''
+        killed.append(True)
+        cmd.kill()
+
+    watchdog = threading.Timer(timeout, kill) if timeout else None
+    if watchdog:
+        watchdog.daemon = True
+        watchdog.start()
+    out = cmd.communicate()[0]
+    if watchdog:
+        watchdog.cancel()
+    return dict(rc=cmd.returncode, output=out.decode('utf-8', 'replace'), duration=int((time.time() - start) * 1000), timeout=bool(killed))
+
+
+class HelperClient(object):
+    ''' A connection to the helper process, used by the screensaver '''
+
+    def __init__(self, path):
+        ''' Connect to the helper's Unix socket '''
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(path)
+        except socket.error:
+            self.sock.close()
+            raise
+        self.stream = self.sock.makefile('rb')
+        self.lock = threading.Lock()
+
+    def run(self, command, timeout=None):
+        ''' Ask the helper to run a command and return its response, commands from several threads take turns '''
+        with self.lock:
+            # Give the helper some time to report the command was killed
+            self.sock.settimeout(timeout + 5 if timeout else None)
+            self.sock.sendall((json.dumps(dict(command=list(command), timeout=timeout)) + '\n').encode('utf-8'))
+            line = self.stream.readline()
+        if not line:
+            raise IOError('Helper closed the connection')
+        return json.loads(line.decode('utf-8'))
+
+    def close(self):
+        ''' Close the connection, the helper keeps running '''
+        self.stream.close()
+        self.sock.close()
+
+
+def main(args):
+    ''' Run the helper using: helper.py <socket> <commands as JSON> [<owner uid>] '''
+    owner = int(args[2]) if len(args) > 2 else None
+    helper = Helper(args[0], json.loads(args[1]), owner=owner)
+    helper.bind()
+    helper.serve()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
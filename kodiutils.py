@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' All functionality that requires Kodi imports '''
+
+from __future__ import absolute_import, division, unicode_literals
+import sys
+import atexit
+try:  # Python 3
+    from time import monotonic as timer
+except ImportError:  # Python 2
+    from time import time as timer
+
+# Number of log records kept in memory before they are written to the Kodi log
+LOG_BUFFER_SIZE = 64
+
+# Log arguments that cannot change before they are rendered, anything else is rendered when it is logged
+if sys.version_info.major == 2:
+    LOG_SCALARS = (basestring, bool, float, int, long, type(None), BaseException)  # noqa: F821; pylint: disable=undefined-variable
+else:
+    LOG_SCALARS = (bytes, str, bool, float, int, type(None), BaseException)
+
+# Size (in bytes) of the trace file before it is rotated
+TRACE_FILE_SIZE = 512 * 1024
+
+# Serialized JSON-RPC requests without parameters or with constant parameters (e.g. mute on/off)
+JSONRPC_PAYLOADS = {}
+
+
+def from_unicode(text, encoding='utf-8'):
+    ''' Force unicode to text '''
+    if sys.version_info.major == 2 and isinstance(text, unicode):  # noqa: F821; pylint: disable=undefined-variable
+        return text.encode(encoding)
+    return text
+
+
+def to_unicode(text, encoding='utf-8'):
+    ''' Force text to unicode '''
+    return text.decode(encoding) if isinstance(text, bytes) else text
+
+
+def addon_icon():
+    ''' Cache and return VRT NU Add-on icon '''
+    if not hasattr(addon_icon, 'cached'):
+        from xbmcaddon import Addon
+        addon_icon.cached = to_unicode(Addon().getAddonInfo('icon'))
+    return getattr(addon_icon, 'cached')
+
+
+def addon_id():
+    ''' Cache and return VRT NU Add-on ID '''
+    if not hasattr(addon_id, 'cached'):
+        from xbmcaddon import Addon
+        addon_id.cached = to_unicode(Addon().getAddonInfo('id'))
+    return getattr(addon_id, 'cached')
+
+
+def addon_name():
+    ''' Cache and return VRT NU Add-on name '''
+    if not hasattr(addon_name, 'cached'):
+        from xbmcaddon import Addon
+        addon_name.cached = to_unicode(Addon().getAddonInfo('name'))
+    return getattr(addon_name, 'cached')
+
+
+def addon_profile():
+    ''' Cache and return the Add-on profile directory, creating it when needed '''
+    if not hasattr(addon_profile, 'cached'):
+        import os
+        from xbmc import translatePath
+        from xbmcaddon import Addon
+        path = to_unicode(translatePath(Addon().getAddonInfo('profile')))
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        addon_profile.cached = path
+    return getattr(addon_profile, 'cached')
+
+
+def addon_path():
+    ''' Cache and return VRT NU Add-on path '''
+    if not hasattr(addon_path, 'cached'):
+        from xbmcaddon import Addon
+        addon_path.cached = to_unicode(Addon().getAddonInfo('path'))
+    return getattr(addon_path, 'cached')
+
+
+class LogBuffer(object):
+    ''' A bounded ring buffer of log records, flushed to the Kodi log in batches '''
+
+    def __init__(self, size=LOG_BUFFER_SIZE):
+        ''' Initialize log buffer '''
+        from collections import deque
+        from string import Formatter
+        self.formatter = Formatter()
+        self.records = deque(maxlen=size)
+        self.size = size
+        self.templates = {}
+
+    def compile(self, message):
+        ''' Cache and return a parsed message template '''
+        template = self.templates.get(message)
+        if template is None:
+            template = self.templates[message] = tuple(self.formatter.parse(message))
+        return template
+
+    def render(self, message, kwargs):
+        ''' Render a message template, leaving missing keys as their original placeholder '''
+        parts = []
+        for literal, field, spec, conversion in self.compile(message):
+            parts.append(literal)
+            if field is None:
+                continue
+            try:
+                value = self.formatter.get_field(field, (), kwargs)[0]
+            except (AttributeError, IndexError, KeyError):
+                parts.append('{' + field + '}')
+                continue
+            parts.append(self.formatter.format_field(self.formatter.convert_field(value, conversion), spec))
+        return ''.join(parts)
+
+    def append(self, level, message, kwargs):
+        ''' Add a record to the buffer, the message is only rendered when flushed '''
+        if kwargs:  # E.g. a timeline that is still growing is logged as it is now
+            kwargs = dict((key, value if isinstance(value, LOG_SCALARS) else '{0}'.format(value)) for key, value in kwargs.items())
+        self.records.append((level, message, kwargs))
+        if len(self.records) >= self.size:
+            self.flush()
+
+    def flush(self):
+        ''' Write all buffered records to the Kodi log '''
+        from xbmc import log as xlog
+        prefix = '[{addon}] '.format(addon=addon_id())
+        while self.records:
+            try:
+                level, message, kwargs = self.records.popleft()
+            except IndexError:  # Another thread emptied the buffer
+                break
+            if kwargs:
+                message = self.render(message, kwargs)
+            xlog(from_unicode(prefix + message), level)
+
+
+LOG_BUFFER = LogBuffer()
+atexit.register(LOG_BUFFER.flush)
+
+
+class Span(object):
+    ''' Time a single phase of a traced cycle '''
+    __slots__ = ('trace', 'name', 'detail', 'start')
+
+    def __init__(self, trace, name, detail=None):
+        ''' Initialize span '''
+        self.trace = trace
+        self.name = name
+        self.detail = detail
+        self.start = None
+
+    def __enter__(self):
+        ''' Start timing '''
+        self.start = timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ''' Add the phase to the trace '''
+        phase = dict(name=self.name, offset=round((self.start - self.trace.start) * 1000, 2), duration=round((timer() - self.start) * 1000, 2))
+        if self.detail is not None:
+            phase['detail'] = self.detail
+        if exc_type is not None:
+            phase['error'] = exc_type.__name__
+        self.trace.phases.append(phase)
+
+
+class NoSpan(object):
+    ''' A span that does nothing, used when tracing is disabled '''
+    __slots__ = ()
+
+    def __enter__(self):
+        ''' Do nothing '''
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ''' Do nothing '''
+
+
+NO_SPAN = NoSpan()
+
+
+class Trace(object):
+    ''' The timing spans of a single activation or wake cycle '''
+
+    def __init__(self, cycle):
+        ''' Initialize trace '''
+        from time import time
+        self.cycle = cycle
+        self.info = {}
+        self.phases = []
+        self.start = timer()
+        self.time = time()
+
+    def record(self, outcome):
+        ''' Return the trace as a single structured record '''
+        return dict(self.info, cycle=self.cycle, time=round(self.time, 3), duration=round((timer() - self.start) * 1000, 2),
+                    outcome=outcome, phases=sorted(self.phases, key=lambda phase: phase.get('offset')))
+
+
+class Tracer(object):
+    ''' Trace activation and wake cycles, and append them to a rotating JSON-lines file in the add-on profile '''
+
+    def __init__(self):
+        ''' Initialize tracer '''
+        self.trace = None
+
+    def start(self, cycle, **info):
+        ''' Start tracing a cycle, an open trace for the same cycle is continued '''
+        if self.trace is not None:
+            if self.trace.cycle == cycle:
+                self.trace.info.update(info)
+                return
+            self.finish('interrupted')
+        if not get_settings().trace:
+            return
+        self.trace = Trace(cycle)
+        self.trace.info.update(info)
+
+    def annotate(self, **info):
+        ''' Add information to the current trace, e.g. the display method '''
+        if self.trace is not None:
+            self.trace.info.update(info)
+
+    def span(self, name, detail=None):
+        ''' Return a span that times a phase of the current trace '''
+        if self.trace is None:
+            return NO_SPAN
+        return Span(self.trace, name, detail)
+
+    def mark(self, name):
+        ''' Record when something happened in the current trace, e.g. when Kodi called us '''
+        if self.trace is not None:
+            with Span(self.trace, name):
+                pass
+
+    def finish(self, outcome):
+        ''' Finish the current trace and append it to the trace file '''
+        trace, self.trace = self.trace, None
+        if trace is None:
+            return
+        import os
+        from json import dumps
+        path = os.path.join(addon_profile(), 'trace.jsonl')
+        try:
+            if os.path.exists(path) and os.path.getsize(path) > TRACE_FILE_SIZE:
+                if os.path.exists(path + '.1'):
+                    os.unlink(path + '.1')
+                os.rename(path, path + '.1')
+            with open(path, 'a') as fdesc:
+                fdesc.write(dumps(trace.record(outcome), sort_keys=True) + '\n')
+        except (IOError, OSError) as exc:
+            log(2, "Cannot write trace to '{path}': {exc}", path=path, exc=exc)
+
+
+TRACER = Tracer()
+
+
+def log_level(level):
+    ''' Return the Kodi log level for a message, or None when the message would be dropped '''
+    if not hasattr(log, 'debug_logging'):
+        log.debug_logging = get_global_setting('debug.showloginfo')  # Returns a boolean
+    if getattr(log, 'debug_logging'):
+        return level % 3
+    max_log_level = get_settings().max_log_level
+    if level <= max_log_level and max_log_level != 0:
+        return 2
+    return None
+
+
+def log(level=1, message='', **kwargs):
+    ''' Log info messages to Kodi '''
+    xbmc_level = log_level(level)
+    if xbmc_level is None:
+        return
+    LOG_BUFFER.append(xbmc_level, message, kwargs)
+
+
+def log_error(message, **kwargs):
+    ''' Log error messages to Kodi, flushing everything that was buffered before '''
+    LOG_BUFFER.append(4, message, kwargs)
+    LOG_BUFFER.flush()
+
+
+def jsonrpc(method, params=None):
+    ''' Perform JSONRPC calls '''
+    batch = JsonRpcBatch()
+    request_id = batch.add(method, params)
+    return batch.send().get(request_id, {})
+
+
+def jsonrpc_payload(method, params=None):
+    ''' Cache and return a serialized JSON-RPC request, without its id '''
+    try:
+        key = (method, tuple(sorted(params.items())) if params else None)
+        payload = JSONRPC_PAYLOADS.get(key)
+    except TypeError:  # Nested parameters cannot be cached
+        key, payload = None, None
+    if payload is None:
+        from json import dumps
+        payload = dumps(dict(jsonrpc='2.0', method=method, params=params) if params else dict(jsonrpc='2.0', method=method))
+        if key is not None:
+            JSONRPC_PAYLOADS[key] = payload
+    return payload
+
+
+class JsonRpcBatch(object):
+    ''' Collect JSON-RPC calls and send them to Kodi as a single batch request '''
+
+    def __init__(self):
+        ''' Initialize batch '''
+        self.callbacks = {}
+        self.methods = []
+        self.requests = []
+
+    def add(self, method, params=None, callback=None):
+        ''' Queue a JSON-RPC call, the callback is called with its response once the batch is sent '''
+        request_id = len(self.requests) + 1
+        self.methods.append(method)
+        self.requests.append('{"id": %d, %s' % (request_id, jsonrpc_payload(method, params)[1:]))
+        if callback:
+            self.callbacks[request_id] = callback
+        return request_id
+
+    def send(self):
+        ''' Send all queued calls at once and return the responses by id '''
+        if not self.requests:
+            return {}
+        from json import loads
+        from xbmc import executeJSONRPC
+        payload = self.requests[0] if len(self.requests) == 1 else '[' + ', '.join(self.requests) + ']'
+        with TRACER.span('jsonrpc', ', '.join(self.methods)):
+            result = loads(executeJSONRPC(payload))
+        if hasattr(log, 'debug_logging'):
+            log(3, "Sending JSON-RPC payload: '{payload}' returns '{result}'", payload=payload, result=result)
+        responses = dict((response.get('id'), response) for response in (result if isinstance(result, list) else [result]))
+        for request_id, callback in sorted(self.callbacks.items()):
+            callback(responses.get(request_id, {}))
+        self.callbacks = {}
+        self.methods = []
+        self.requests = []
+        return responses
+
+
+class Settings(object):
+    ''' A snapshot of all add-on settings, converted to their proper types '''
+    __slots__ = ('display_method', 'fallback_method', 'fallback_mode', 'fallback_budget', 'outputs', 'power_method', 'confirm_display_off',
+                 'logoff', 'mute', 'grace_period', 'resume_mode', 'wake_listener', 'prewake', 'prewake_confidence', 'prewake_lead',
+                 'command_helper', 'command_helper_su', 'action_timeout', 'service',
+                 'max_log_level', 'trace', 'profile', 'profile_memory')
+
+    def __init__(self):
+        ''' Load all add-on settings at once '''
+        from xbmcaddon import Addon
+        addon = Addon()
+
+        def setting(setting_id, default):
+            ''' Get an add-on setting from the shared Addon() instance '''
+            value = to_unicode(addon.getSetting(setting_id))
+            return default if value == '' else value
+
+        self.display_method = int(setting('display_method', 0))
+        self.fallback_method = int(setting('fallback_method', 0))
+        self.fallback_mode = int(setting('fallback_mode', 0))
+        self.fallback_budget = int(setting('fallback_budget', 2))
+        self.outputs = [output.strip() for output in setting('outputs', '').split(',') if output.strip()]
+        self.power_method = int(setting('power_method', 0))
+        self.confirm_display_off = setting('confirm_display_off', 'false') == 'true'
+        self.logoff = setting('logoff', 'false') == 'true'
+        self.mute = setting('mute', 'true') == 'true'
+        self.grace_period = int(setting('grace_period', 0))
+        self.resume_mode = int(setting('resume_mode', 0))
+        self.wake_listener = setting('wake_listener', 'false') == 'true'
+        self.prewake = setting('prewake', 'false') == 'true'
+        self.prewake_confidence = int(setting('prewake_confidence', 80))
+        self.prewake_lead = int(setting('prewake_lead', 10))
+        self.command_helper = setting('command_helper', 'false') == 'true'
+        self.command_helper_su = setting('command_helper_su', 'false') == 'true'
+        self.action_timeout = int(setting('action_timeout', 10))
+        self.service = setting('service', 'false') == 'true'
+        self.max_log_level = int(setting('max_log_level', 0))
+        self.trace = setting('trace', 'false') == 'true'
+        self.profile = setting('profile', 'false') == 'true'
+        self.profile_memory = setting('profile_memory', 'false') == 'true'
+
+    def __repr__(self):
+        ''' Show all settings, useful for logging '''
+        return 'Settings(%s)' % ', '.join('%s=%r' % (key, getattr(self, key)) for key in self.__slots__)
+
+
+def get_settings(refresh=False):
+    ''' Cache and return a snapshot of all add-on settings '''
+    if refresh or not hasattr(get_settings, 'cached'):
+        get_settings.cached = Settings()
+    return getattr(get_settings, 'cached')
+
+
+def get_global_setting(setting):
+    ''' Get a Kodi setting '''
+    result = jsonrpc(method='Settings.GetSettingValue', params=dict(setting=setting))
+    return result.get('result', {}).get('value')
+
+
+def notification(heading='', message='', icon='', time=4000):
+    ''' Show a Kodi notification '''
+    from xbmcgui import Dialog
+    if not heading:
+        heading = addon_name()
+    if not icon:
+        icon = addon_icon()
+    Dialog().notification(heading=heading, message=message, icon=icon, time=time)
+
+
+def set_mute(toggle=True, batch=None):
+    ''' Set mute using Kodi JSON-RPC interface '''
+    if batch is not None:
+        batch.add('Application.SetMute', dict(mute=toggle))
+        return
+    jsonrpc(method='Application.SetMute', params=dict(mute=toggle))
+
+
+def activate_window(window='home', batch=None):
+    ''' Set mute using Kodi JSON-RPC interface '''
+#    result = jsonrpc(method='GUI.ActivateWindow', params=dict(window=window, parameters=['Home']))
+    if batch is not None:
+        batch.add('GUI.ActivateWindow', dict(window=window))
+        return
+    jsonrpc(method='GUI.ActivateWindow', params=dict(window=window))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Power off the system by calling systemd-logind over D-Bus, without going through Kodi '''
+
+from __future__ import absolute_import, division, unicode_literals
+from ctypes import POINTER, Structure, byref, c_char_p, c_int, c_uint, c_uint32, c_void_p
+from xdpms import load_library
+
+# See dbus/dbus-protocol.h and dbus/dbus-shared.h
+DBUS_BUS_SYSTEM = 1
+DBUS_TYPE_BOOLEAN = ord('b')
+
+LOGIND_NAME = 'org.freedesktop.login1'
+LOGIND_PATH = '/org/freedesktop/login1'
+LOGIND_INTERFACE = 'org.freedesktop.login1.Manager'
+
+# Time (in milliseconds) to wait for logind to answer
+LOGIND_TIMEOUT = 5000
+
+
+class DBusError(Structure):
+    ''' struct DBusError '''
+    _fields_ = [('name', c_char_p), ('message', c_char_p), ('dummy', c_uint), ('padding', c_void_p)]
+
+
+class DBusMessageIter(Structure):
+    ''' struct DBusMessageIter, only used as room for libdbus to fill in '''
+    _fields_ = [('data', c_void_p * 16)]
+
+
+class DBusConnection(object):
+    ''' A private connection to the system bus (or another bus) that is kept open for the whole screensaver session '''
+
+    def __init__(self, address=None):
+        ''' Connect and register on the bus, defaults to the system bus '''
+        self.dbus = load_library('dbus-1')
+
+        self.dbus.dbus_bus_get_private.argtypes = [c_int, POINTER(DBusError)]
+        self.dbus.dbus_bus_get_private.restype = c_void_p
+        self.dbus.dbus_bus_register.argtypes = [c_void_p, POINTER(DBusError)]
+        self.dbus.dbus_connection_close.argtypes = [c_void_p]
+        self.dbus.dbus_connection_open_private.argtypes = [c_char_p, POINTER(DBusError)]
+        self.dbus.dbus_connection_open_private.restype = c_void_p
+        self.dbus.dbus_connection_send_with_reply_and_block.argtypes = [c_void_p, c_void_p, c_int, POINTER(DBusError)]
+        self.dbus.dbus_connection_send_with_reply_and_block.restype = c_void_p
+        self.dbus.dbus_connection_set_exit_on_disconnect.argtypes = [c_void_p, c_uint32]
+        self.dbus.dbus_connection_unref.argtypes = [c_void_p]
+        self.dbus.dbus_error_free.argtypes = [POINTER(DBusError)]
+        self.dbus.dbus_error_init.argtypes = [POINTER(DBusError)]
+        self.dbus.dbus_error_is_set.argtypes = [POINTER(DBusError)]
+        self.dbus.dbus_message_iter_append_basic.argtypes = [POINTER(DBusMessageIter), c_int, c_void_p]
+        self.dbus.dbus_message_iter_init_append.argtypes = [c_void_p, POINTER(DBusMessageIter)]
+        self.dbus.dbus_message_new_method_call.argtypes = [c_char_p, c_char_p, c_char_p, c_char_p]
+        self.dbus.dbus_message_new_method_call.restype = c_void_p
+        self.dbus.dbus_message_unref.argtypes = [c_void_p]
+
+        # Our calls are made from the screensaver's worker threads
+        self.dbus.dbus_threads_init_default()
+
+        error = self.error()
+        if address is None:
+            self.connection = self.dbus.dbus_bus_get_private(DBUS_BUS_SYSTEM, byref(error))
+        else:
+            self.connection = self.dbus.dbus_connection_open_private(address.encode('utf-8'), byref(error))
+            if self.connection:
+                self.dbus.dbus_bus_register(self.connection, byref(error))
+        try:
+            self.check(error)
+        except OSError:
+            self.close()
+            raise
+        if not self.connection:
+            raise OSError('Cannot connect to D-Bus')
+        # By default libdbus calls _exit() when the bus goes away, which would take Kodi down with it
+        self.dbus.dbus_connection_set_exit_on_disconnect(self.connection, 0)
+
+    def error(self):
+        ''' Return an initialized DBusError '''
+        error = DBusError()
+        self.dbus.dbus_error_init(byref(error))
+        return error
+
+    def check(self, error):
+        ''' Raise an OSError when a D-Bus call failed '''
+        if not self.dbus.dbus_error_is_set(byref(error)):
+            return
+        message = '%s: %s' % (error.name.decode('utf-8'), (error.message or b'').decode('utf-8'))
+        self.dbus.dbus_error_free(byref(error))
+        raise OSError(message)
+
+    def call(self, destination, path, interface, member, *args):
+        ''' Call a method with boolean arguments and wait for it to return '''
+        message = self.dbus.dbus_message_new_method_call(destination.encode('utf-8'), path.encode('utf-8'),
+                                                         interface.encode('utf-8'), member.encode('utf-8'))
+        if not message:
+            raise MemoryError('Cannot create D-Bus message')
+        arguments = DBusMessageIter()
+        self.dbus.dbus_message_iter_init_append(message, byref(arguments))
+        for arg in args:
+            self.dbus.dbus_message_iter_append_basic(byref(arguments), DBUS_TYPE_BOOLEAN, byref(c_uint32(int(arg))))
+        error = self.error()
+        reply = self.dbus.dbus_connection_send_with_reply_and_block(self.connection, message, LOGIND_TIMEOUT, byref(error))
+        self.dbus.dbus_message_unref(message)
+        if reply:
+            self.dbus.dbus_message_unref(reply)
+        self.check(error)
+
+    def close(self):
+        ''' Close the connection '''
+        if self.connection:
+            self.dbus.dbus_connection_close(self.connection)
+            self.dbus.dbus_connection_unref(self.connection)
+            self.connection = None
+
+
+class Logind(object):
+    ''' The systemd-logind manager, called over a connection that stays open '''
+
+    def __init__(self, connection):
+        ''' Initialize using an open DBusConnection '''
+        self.connection = connection
+
+    def power_off(self, method):
+        ''' Call a logind power method, e.g. 'Suspend', 'Hibernate' or 'PowerOff', without asking interactively '''
+        self.connection.call(LOGIND_NAME, LOGIND_PATH, LOGIND_INTERFACE, method, False)
+
+    def close(self):
+        ''' Close the connection '''
+        self.connection.close()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' The display and power methods, their functions are called by name using screensaver.func() '''
+
+from __future__ import absolute_import, division, unicode_literals
+
+# NOTE: The below order relates to resources/settings.xml
+DISPLAY_METHODS = [
+    dict(name='do-nothing', title='Do nothing',
+         function='log',
+         args_off=[2, 'Do nothing to power off display'],
+         args_on=[2, 'Do nothing to power back on display']),
+    dict(name='cec-builtin', title='CEC (buil-in)',
+         function='run_builtin',
+         args_off=['CECStandby'],
+         args_on=['CECActivateSource']),
+    dict(name='no-signal-rpi', title='No Signal on Raspberry Pi (using vcgencmd)',
+         function='run_command', condition='System.Platform.Linux.RaspberryPi',
+         args_off=['vcgencmd', 'display_power', '0'],
+         args_on=['vcgencmd', 'display_power', '1']),
+    dict(name='dpms-builtin', title='DPMS (built-in)',
+         function='run_builtin',
+         args_off=['ToggleDPMS'],
+         args_on=['ToggleDPMS']),
+    dict(name='dpms-xset', title='DPMS (using xset)',
+         function='run_command',
+         args_off=['xset', 'dpms', 'force', 'off'],
+         args_on=['xset', 'dpms', 'force', 'on']),
+    dict(name='dpms-vbetool', title='DPMS (using vbetool)',
+         function='run_command',
+         args_off=['vbetool', 'dpms', 'off'],
+         args_on=['vbetool', 'dpms', 'on']),
+    # TODO: This needs more outside testing
+    dict(name='dpms-xrandr', title='DPMS (using xrandr)',
+         function='set_outputs',
+         args_off=['off'],
+         args_on=['on']),
+    # TODO: This needs more outside testing
+    dict(name='cec-android', title='CEC on Android (kernel)',
+         function='write_sysfs', condition='System.Platform.Android',
+         args_off=['/sys/devices/virtual/graphics/fb0/cec', '0'],
+         args_on=['/sys/devices/virtual/graphics/fb0/cec', '1'],
+         function_state='sysfs_state',
+         args_state=['/sys/devices/virtual/graphics/fb0/cec', '1']),
+    # NOTE: Contrary to what one might think, 1 means off and 0 means on
+    dict(name='backlight-rpi', title='Backlight on Raspberry Pi (kernel)',
+         function='write_sysfs', condition='System.Platform.Linux.RaspberryPi',
+         args_off=['/sys/class/backlight/rpi_backlight/bl_power', '1'],
+         args_on=['/sys/class/backlight/rpi_backlight/bl_power', '0'],
+         function_state='sysfs_state',
+         args_state=['/sys/class/backlight/rpi_backlight/bl_power', '0']),
+    dict(name='backlight-odroid-c2', title='Backlight on Odroid C2 (kernel)',
+         function='write_sysfs',
+         args_off=['/sys/class/amhdmitx/amhdmitx0/phy', '0'],
+         args_on=['/sys/class/amhdmitx/amhdmitx0/phy', '1'],
+         function_state='sysfs_state',
+         args_state=['/sys/class/amhdmitx/amhdmitx0/phy', '1']),
+    dict(name='dpms-x11', title='DPMS (using X11)',
+         function='set_dpms',
+         args_off=['off'],
+         args_on=['on'],
+         function_state='dpms_state',
+         args_state=['on']),
+    # NOTE: This is replaced by the fastest reliable method at activation, see auto_display_method()
+    dict(name='auto', title='Automatic (fastest working method)',
+         function='log',
+         args_off=[2, 'No display method was selected automatically'],
+         args_on=[2, 'No display method was selected automatically']),
+    # NOTE: DPMS using DRM/KMS (set_drm_dpms) is left out, setting a connector property needs DRM master,
+    #       which Kodi holds when it renders using GBM, and the X server holds under X11
+    dict(name='ddc-ci', title='DDC/CI power mode (kernel)',
+         function='set_ddc_power',
+         args_off=['off'],
+         args_on=['on'],
+         function_state='ddc_power_state',
+         args_state=['on']),
+]
+
+POWER_METHODS = [
+    dict(name='do-nothing', title='Do nothing',
+         function='log', kwargs_off=dict(level=2, message='Do nothing to power off system')),
+    dict(name='suspend-builtin', title='Suspend (built-in)',
+         function='jsonrpc', kwargs_off=dict(method='System.Suspend'), condition='System.CanSuspend'),
+    dict(name='hibernate-builtin', title='Hibernate (built-in)',
+         function='jsonrpc', kwargs_off=dict(method='System.Hibernate'), condition='System.CanHibernate'),
+    dict(name='quit-builtin', title='Quit (built-in)',
+         function='jsonrpc', kwargs_off=dict(method='Application.Quit')),
+    dict(name='shutdown-builtin', title='ShutDown action (built-in)',
+         function='jsonrpc', kwargs_off=dict(method='System.Shutdown')),
+    dict(name='reboot-builtin', title='Reboot (built-in)',
+         function='jsonrpc', kwargs_off=dict(method='System.Reboot'), condition='System.CanReboot'),
+    dict(name='powerdown-builtin', title='Powerdown (built-in)',
+         function='jsonrpc', kwargs_off=dict(method='System.Powerdown'), condition='System.CanPowerDown'),
+    dict(name='suspend-logind', title='Suspend (using logind)',
+         function='logind_power_off', kwargs_off=dict(method='Suspend')),
+    dict(name='hibernate-logind', title='Hibernate (using logind)',
+         function='logind_power_off', kwargs_off=dict(method='Hibernate')),
+    dict(name='powerdown-logind', title='Powerdown (using logind)',
+         function='logind_power_off', kwargs_off=dict(method='PowerOff')),
+]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Discover the connected display outputs, and switch all of them off and on using a single xrandr command '''
+
+from __future__ import absolute_import, division, unicode_literals
+import os
+import re
+
+# Where the kernel lists the DRM connectors and whether they are connected
+DRM_PATH = '/sys/class/drm'
+
+# E.g. 'HDMI-1 connected primary 1920x1080+0+0 (normal left inverted right x axis y axis) 527mm x 296mm'
+XRANDR_OUTPUT = re.compile(r'^(?P<name>\S+) (?P<status>connected|disconnected|unknown connection)(?P<primary> primary)?'
+                           r'(?: (?P<mode>\d+x\d+)\+(?P<x>\d+)\+(?P<y>\d+))?')
+
+
+def parse_xrandr(text):
+    ''' Return the outputs listed by 'xrandr --query', with their current mode and position when they are active '''
+    outputs = []
+    for line in text.splitlines():
+        match = XRANDR_OUTPUT.match(line)
+        if not match:
+            continue
+        output = dict(name=match.group('name'), connected=match.group('status') == 'connected', primary=bool(match.group('primary')))
+        if match.group('mode'):
+            output.update(mode=match.group('mode'), position='%sx%s' % (match.group('x'), match.group('y')))
+        outputs.append(output)
+    return outputs
+
+
+def drm_connectors(path=DRM_PATH):
+    ''' Return the status of every DRM connector, e.g. {'card0-HDMI-A-1': 'connected'} '''
+    connectors = {}
+    try:
+        names = os.listdir(path)
+    except OSError:  # No DRM, e.g. not on Linux
+        return connectors
+    for name in names:
+        try:
+            with open(os.path.join(path, name, 'status')) as fdesc:
+                connectors[name] = fdesc.read().strip()
+        except (IOError, OSError):  # Not a connector, e.g. card0 or version
+            continue
+    return connectors
+
+
+def xrandr_command(outputs, mode):
+    ''' Return a single xrandr command that switches all outputs off, or back on using their previous mode and position '''
+    command = ['xrandr']
+    for output in outputs:
+        command.extend(['--output', output.get('name')])
+        if mode == 'off':
+            command.append('--off')
+        elif output.get('mode'):
+            command.extend(['--mode', output.get('mode'), '--pos', output.get('position')])
+            if output.get('primary'):
+                command.append('--primary')
+        else:
+            command.append('--auto')
+    return command
+
+
+class Outputs(object):
+    ''' The connected outputs, enumerated once and cached until a DRM connector is (un)plugged '''
+
+    def __init__(self, query, drm_path=DRM_PATH):
+        ''' Initialize outputs, query is a function that returns the output of 'xrandr --query' '''
+        self.connectors = None
+        self.drm_path = drm_path
+        self.outputs = None
+        self.query = query
+
+    def connected(self, names=None):
+        ''' Return the connected outputs, optionally only the ones with the given names '''
+        connectors = drm_connectors(self.drm_path)
+        if self.outputs is None or connectors != self.connectors:
+            self.outputs = [output for output in parse_xrandr(self.query()) if output.get('connected')]
+            self.connectors = connectors
+        if not names:
+            return self.outputs
+        return [output for output in self.outputs if output.get('name') in names]
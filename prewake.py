@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Learn when the screensaver is usually deactivated, to turn the display on shortly before
+
+For every weekday and time slot we count how often the screensaver was active during that slot, and how
+often it was deactivated in it. Their ratio is the confidence that someone comes back in that slot.
+Whether turning the display on ahead of time was right is recorded as hits and misses.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+from kodiutils import log
+
+# Length of a time slot (in minutes)
+PREWAKE_SLOT = 15
+PREWAKE_SLOTS = 24 * 60 // PREWAKE_SLOT
+
+# Minimal number of times the screensaver was active during a slot before we predict anything for it
+PREWAKE_SAMPLES = 4
+
+# Counts are halved once a slot was seen this often, so old habits fade away
+PREWAKE_MAX_COUNT = 64
+
+# How far ahead (in slots) we look for a predicted wake, one day
+PREWAKE_HORIZON = PREWAKE_SLOTS
+
+
+def slot_of(timestamp):
+    ''' Return the weekday and slot of a timestamp, in local time '''
+    from time import localtime
+    local = localtime(timestamp)
+    return local.tm_wday, (local.tm_hour * 60 + local.tm_min) // PREWAKE_SLOT
+
+
+class UsagePatterns(object):
+    ''' Per weekday and time slot histograms of screensaver sessions and wakes, stored in the add-on profile '''
+
+    def __init__(self, path):
+        ''' Load the histograms and hit/miss statistics '''
+        from json import load
+        self.path = path
+        try:
+            with open(path) as fdesc:
+                data = load(fdesc)
+            if data.get('slot') != PREWAKE_SLOT:  # Slots of a different length cannot be reused
+                data = {}
+        except (IOError, OSError, ValueError):
+            data = {}
+        self.changed = False
+        self.active = data.get('active') or [[0] * PREWAKE_SLOTS for _ in range(7)]
+        self.wakes = data.get('wakes') or [[0] * PREWAKE_SLOTS for _ in range(7)]
+        self.stats = data.get('stats') or dict(hits=0, misses=0, unpredicted=0, early=0)
+
+    def record(self, activated, deactivated):
+        ''' Record a screensaver session, from activation until deactivation (timestamps in seconds) '''
+        seen = set()
+        for timestamp in range(int(activated), int(deactivated) + 1, PREWAKE_SLOT * 60):
+            seen.add(slot_of(timestamp))
+            if len(seen) >= 7 * PREWAKE_SLOTS:
+                break
+        seen.add(slot_of(deactivated))
+        for weekday, slot in seen:
+            self.active[weekday][slot] += 1
+        wake_weekday, wake_slot = slot_of(deactivated)
+        self.wakes[wake_weekday][wake_slot] += 1
+        if any(self.active[weekday][slot] >= PREWAKE_MAX_COUNT for weekday, slot in seen):
+            self.active = [[count // 2 for count in counts] for counts in self.active]
+            self.wakes = [[count // 2 for count in counts] for counts in self.wakes]
+        self.changed = True
+
+    def confidence(self, weekday, slot):
+        ''' Return how likely the screensaver is deactivated during a slot, or None when we know too little '''
+        active = self.active[weekday][slot]
+        if active < PREWAKE_SAMPLES:
+            return None
+        return self.wakes[weekday][slot] / active
+
+    def next_wake(self, now, threshold):
+        ''' Return the start (timestamp) of the first upcoming slot we are confident about, or None '''
+        start = now - now % (PREWAKE_SLOT * 60)  # Every time zone offset is a multiple of a slot
+        for index in range(1, PREWAKE_HORIZON + 1):  # The current slot is when someone just left
+            timestamp = start + index * PREWAKE_SLOT * 60
+            confidence = self.confidence(*slot_of(timestamp))
+            if confidence is not None and confidence >= threshold:
+                log(2, 'Predicted wake in {minutes} minutes with {confidence:.0%} confidence',
+                    minutes=int((timestamp - now) // 60), confidence=confidence)
+                return timestamp
+        return None
+
+    def outcome(self, outcome, early=0):
+        ''' Record a pre-wake that was a hit (with how many seconds early) or a miss, or a wake that was not predicted '''
+        self.stats[outcome] += 1
+        self.stats['early'] += int(early)
+        self.changed = True
+        log(2, 'Pre-wake {outcome}: {hits} hits, {misses} misses, {unpredicted} wakes not predicted, on average {average}s early',
+            outcome=outcome, hits=self.stats.get('hits'), misses=self.stats.get('misses'), unpredicted=self.stats.get('unpredicted'),
+            average=self.stats.get('early') // max(self.stats.get('hits'), 1))
+
+    def save(self):
+        ''' Write the histograms to the add-on profile, if anything changed '''
+        from json import dump
+        if not self.changed:
+            return
+        with open(self.path, 'w') as fdesc:
+            dump(dict(slot=PREWAKE_SLOT, active=self.active, wakes=self.wakes, stats=self.stats), fdesc, separators=(',', ':'))
+        self.changed = False
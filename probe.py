@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Probe once which display and power methods can work on this system
+
+The results are cached in the add-on profile together with a fingerprint of everything they depend on
+(Kodi version, platform, boot, PATH and the method definitions), so they are only probed again when
+one of those changes, e.g. after a reboot or when a binary was installed.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+import os
+from kodiutils import addon_profile, log
+
+try:  # Python 3
+    from shutil import which
+except ImportError:  # Python 2
+    from distutils.spawn import find_executable as which  # pylint: disable=deprecated-module
+
+# Identifies the boot, sysfs permissions are set up again on every boot
+BOOT_ID = '/proc/sys/kernel/random/boot_id'
+
+# The default D-Bus system bus socket
+DBUS_SYSTEM_BUS = '/var/run/dbus/system_bus_socket'
+
+
+def probe_builtin(method):  # pylint: disable=unused-argument
+    ''' Kodi builtins and JSON-RPC methods are always available '''
+    return True, None
+
+
+def probe_command(method):
+    ''' A command is usable when its binary is on the PATH '''
+    binary = method.get('args_off')[0]
+    if which(binary) is None:
+        return False, "Binary '%s' is not available" % binary
+    return True, None
+
+
+def probe_sysfs(method):
+    ''' A sysfs attribute is usable when it exists, and we can write to it directly or using su '''
+    path = method.get('args_off')[0]
+    if not os.path.exists(path):
+        return False, "Path '%s' does not exist" % path
+    if not os.access(path, os.W_OK) and which('su') is None:
+        return False, "Path '%s' is not writable" % path
+    return True, None
+
+
+def probe_dpms(method):  # pylint: disable=unused-argument
+    ''' The X11 DPMS extension is usable when the X libraries are installed and an X server is set '''
+    from ctypes.util import find_library
+    for library in ('X11', 'Xext'):
+        if find_library(library) is None:
+            return False, "Library '%s' is not available" % library
+    if not os.environ.get('DISPLAY'):
+        return False, 'No X server is available'
+    return True, None
+
+
+def probe_ddc(method):  # pylint: disable=unused-argument
+    ''' A monitor can be controlled using DDC/CI when it answers on one of the i2c-dev devices we can open read-write '''
+    from glob import glob
+    from ddc import I2C_DEVICES, find_monitor
+    devices = sorted(glob(I2C_DEVICES))
+    if not devices:
+        return False, 'No i2c-dev device is available'
+    if not any(os.access(device, os.R_OK | os.W_OK) for device in devices):
+        return False, "i2c-dev device '%s' is not writable" % devices[0]
+    try:
+        find_monitor(os.path.join(addon_profile(), 'ddc.json')).close()
+    except (IOError, OSError) as exc:
+        return False, str(exc)
+    return True, None
+
+
+def probe_drm(method):  # pylint: disable=unused-argument
+    ''' DRM connectors can be switched when we can open a DRM device read-write, and a connected connector has a DPMS property
+
+    This only reads the connector properties, setting one requires DRM master which Kodi (GBM) or the X server holds.
+    '''
+    from glob import glob
+    from drm import DRM_DEVICES, DrmDpms, open_kms_device
+    devices = sorted(glob(DRM_DEVICES))
+    if not devices:
+        return False, 'No DRM device is available'
+    if not any(os.access(device, os.R_OK | os.W_OK) for device in devices):
+        return False, "DRM device '%s' is not writable" % devices[0]
+    try:
+        dpms = DrmDpms(open_kms_device())
+    except OSError as exc:
+        return False, 'Cannot open a DRM device: %s' % exc
+    try:
+        if dpms.mode() is None:
+            return False, 'No connected DRM connector has a DPMS property'
+    except (IOError, OSError) as exc:
+        return False, 'Cannot read the DPMS property: %s' % exc
+    finally:
+        dpms.close()
+    return True, None
+
+
+def probe_logind(method):  # pylint: disable=unused-argument
+    ''' logind can be called when libdbus is installed and the system bus is running '''
+    from ctypes.util import find_library
+    if find_library('dbus-1') is None:
+        return False, "Library 'dbus-1' is not available"
+    if not os.environ.get('DBUS_SYSTEM_BUS_ADDRESS') and not os.path.exists(DBUS_SYSTEM_BUS):
+        return False, 'No D-Bus system bus is available'
+    return True, None
+
+
+def probe_xrandr(method):  # pylint: disable=unused-argument
+    ''' Outputs can be switched when xrandr is on the PATH and an X server is set '''
+    if which('xrandr') is None:
+        return False, "Binary 'xrandr' is not available"
+    if not os.environ.get('DISPLAY'):
+        return False, 'No X server is available'
+    return True, None
+
+
+PROBES = dict(
+    jsonrpc=probe_builtin,
+    log=probe_builtin,
+    logind_power_off=probe_logind,
+    run_builtin=probe_builtin,
+    run_command=probe_command,
+    set_ddc_power=probe_ddc,
+    set_dpms=probe_dpms,
+    set_drm_dpms=probe_drm,
+    set_outputs=probe_xrandr,
+    write_sysfs=probe_sysfs,
+)
+
+
+def probe(method):
+    ''' Return whether a method can work on this system, and why not '''
+    condition = method.get('condition')
+    if condition:
+        from xbmc import getCondVisibility
+        if not getCondVisibility(condition):
+            return False, "Condition '%s' is not met" % condition
+    return PROBES.get(method.get('function'), probe_builtin)(method)
+
+
+def fingerprint(methods):
+    ''' Return a fingerprint of everything the probe results depend on '''
+    from hashlib import md5
+    from json import dumps
+    from platform import uname
+    from xbmc import getInfoLabel
+    try:
+        with open(BOOT_ID) as fdesc:
+            boot_id = fdesc.read().strip()
+    except (IOError, OSError):
+        boot_id = None
+    paths = []
+    for directory in os.environ.get('PATH', '').split(os.pathsep):
+        try:
+            paths.append((directory, os.stat(directory).st_mtime))  # Changes when binaries are (un)installed
+        except OSError:
+            pass
+    data = dict(
+        boot_id=boot_id,
+        display=os.environ.get('DISPLAY'),
+        kodi=getInfoLabel('System.BuildVersion'),
+        methods=methods,
+        paths=paths,
+        platform=list(uname()),
+    )
+    return md5(dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Capabilities(object):
+    ''' Which display and power methods can work on this system, cached in the add-on profile '''
+
+    def __init__(self, path, methods):
+        ''' Load the cached probe results, and probe all methods again when the fingerprint changed '''
+        from json import load
+        self.path = path
+        self.fingerprint = fingerprint(methods)
+        self.results = {}
+        try:
+            with open(path) as fdesc:
+                cache = load(fdesc)
+        except (IOError, OSError, ValueError):
+            cache = {}
+        if cache.get('fingerprint') == self.fingerprint:
+            self.results = cache.get('results', {})
+            return
+        for kind, kind_methods in methods.items():
+            for method in kind_methods:
+                usable, reason = probe(method)
+                self.results['%s/%s' % (kind, method.get('name'))] = dict(usable=usable, reason=reason)
+        log(2, 'Probed {count} methods: {unusable}', count=len(self.results),
+            unusable=', '.join('%s (%s)' % (key, result.get('reason')) for key, result in sorted(self.results.items()) if not result.get('usable')))
+        self.save()
+
+    def usable(self, kind, method):
+        ''' Return whether a method can work on this system, and why not '''
+        result = self.results.get('%s/%s' % (kind, method.get('name')))
+        if result is None:  # Not probed yet
+            return True, None
+        return result.get('usable'), result.get('reason')
+
+    def save(self):
+        ''' Write the probe results to the add-on profile '''
+        from json import dump
+        try:
+            with open(self.path, 'w') as fdesc:
+                dump(dict(fingerprint=self.fingerprint, results=self.results), fdesc, sort_keys=True, indent=2)
+        except (IOError, OSError) as exc:
+            log(2, "Cannot write probe results to '{path}': {exc}", path=self.path, exc=exc)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Profile where Python time (and optionally memory) goes during a single activation and wake cycle
+
+Profiling is armed using the 'profile' setting, and disarmed again once a wake cycle was captured.
+cProfile only profiles the thread it was enabled in, so every thread that takes part in a cycle
+is profiled on its own and the results are combined when the cycle finishes. From Python 3.12 only
+one profiler can be enabled at a time, but it profiles every thread, so the first one covers the others.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+from kodiutils import NO_SPAN, addon_profile, get_settings, log
+
+# Number of functions (or source lines for memory) shown in the stats files
+PROFILE_STATS_LINES = 40
+
+
+class ThreadProfile(object):
+    ''' Profile the current thread while the context is active '''
+    __slots__ = ('profiler', 'profile')
+
+    def __init__(self, profiler):
+        ''' Initialize thread profile '''
+        self.profiler = profiler
+        self.profile = None
+
+    def __enter__(self):
+        ''' Start profiling this thread, unless another profiler that covers it is enabled already '''
+        from cProfile import Profile
+        profile = Profile()
+        with self.profiler.lock:
+            try:
+                profile.enable()
+            except ValueError as exc:  # Python 3.12+: Another profiling tool is already active
+                if not self.profiler.enabled:
+                    self.profiler.abandon(exc)
+                return self
+            self.profile = profile
+            self.profiler.enabled += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        ''' Stop profiling this thread and hand the profile to the profiler '''
+        if self.profile is None:
+            return
+        self.profile.disable()
+        with self.profiler.lock:
+            self.profiler.enabled -= 1
+            if self.profiler.profiles is not None:
+                self.profiler.profiles.append(self.profile)
+
+
+class Profiler(object):
+    ''' Capture the next activation and wake cycle using cProfile, and optionally tracemalloc '''
+
+    def __init__(self):
+        ''' Initialize profiler, it is not capturing until a cycle is started while profiling is armed '''
+        from threading import Lock
+        self.cycle = None
+        self.enabled = 0
+        self.lock = Lock()
+        self.memory = False
+        self.profiles = None
+
+    def start(self, cycle):
+        ''' Start capturing a cycle when profiling is armed '''
+        settings = get_settings()
+        if not settings.profile:
+            return
+        self.cycle = cycle
+        self.memory = False
+        self.profiles = []
+        if settings.profile_memory:
+            try:
+                import tracemalloc
+            except ImportError:  # Python 2
+                log(2, 'Memory profiling requires Python 3')
+            else:
+                tracemalloc.start()
+                self.memory = True
+        log(2, "Profiling the '{cycle}' cycle", cycle=cycle)
+
+    def thread(self):
+        ''' Return a context that profiles the current thread, if we are capturing '''
+        if self.profiles is None:
+            return NO_SPAN
+        return ThreadProfile(self)
+
+    def finish(self):
+        ''' Write out what was captured for this cycle, and disarm profiling after a wake cycle '''
+        profiles, self.profiles = self.profiles, None
+        if profiles is None:
+            return
+        import os
+        from time import strftime
+        path = os.path.join(addon_profile(), 'profile-%s-%s' % (self.cycle, strftime('%Y%m%d-%H%M%S')))
+        try:
+            if profiles:
+                self.save_profiles(profiles, path)
+            if self.memory:
+                self.save_memory(path)
+        except (IOError, OSError) as exc:
+            log(2, "Cannot write profile to '{path}': {exc}", path=path, exc=exc)
+        else:
+            log(2, "Profile of the '{cycle}' cycle was written to '{path}.*'", cycle=self.cycle, path=path)
+        finally:
+            if self.cycle == 'wake':
+                self.disarm()
+
+    def abandon(self, exc):
+        ''' Stop capturing this cycle when we cannot profile, and disarm profiling '''
+        log(2, "Cannot profile the '{cycle}' cycle: {exc}", cycle=self.cycle, exc=exc)
+        self.profiles = None
+        if self.memory:
+            import tracemalloc
+            tracemalloc.stop()
+            self.memory = False
+        self.disarm()
+
+    @staticmethod
+    def disarm():
+        ''' Turn the profile setting off, so only a single cycle is captured '''
+        from xbmcaddon import Addon
+        Addon().setSetting('profile', 'false')
+        get_settings(refresh=True)
+
+    @staticmethod
+    def save_profiles(profiles, path):
+        ''' Combine the profiles of all threads, write them in pstats format and as readable text '''
+        from pstats import Stats
+        with open(path + '.txt', 'w') as fdesc:
+            stats = Stats(profiles[0], stream=fdesc)
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(path + '.prof')
+            stats.sort_stats('cumulative').print_stats(PROFILE_STATS_LINES)
+
+    def save_memory(self, path):
+        ''' Write where memory was allocated during this cycle '''
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.memory = False
+        with open(path + '.memory.txt', 'w') as fdesc:
+            for statistic in snapshot.statistics('lineno')[:PROFILE_STATS_LINES]:
+                fdesc.write('%s\n' % statistic)
+
+
+PROFILER = Profiler()
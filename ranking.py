@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Rank the usable display methods of this system by how fast and reliable they are
+
+Every candidate is first tried for a few screensaver sessions, after which the fastest method that
+succeeds often enough is used. A method that can report the display state only succeeds when it reports
+the display reached its state, a method that cannot report it succeeds when it returns without an error
+in time. Methods that confirmed they worked are ranked ahead of those that could not. The ranking is
+refreshed regularly from the latencies observed in real screensaver sessions, which are recorded by the
+duration statistics.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+from kodiutils import log
+
+# Number of sessions every candidate is tried before it is ranked
+RANKING_TRIALS = 2
+
+# Minimal fraction of successful sessions for a method to be considered reliable
+RANKING_SUCCESS_RATE = 0.9
+
+# Number of sessions after which the ranking is refreshed from observed latencies
+RANKING_SESSIONS = 20
+
+
+class Ranking(object):
+    ''' The outcomes of display methods and their ranking, stored in the add-on profile '''
+
+    def __init__(self, path):
+        ''' Load previously recorded outcomes and ranking '''
+        from json import load
+        self.path = path
+        self.changed = False
+        try:
+            with open(path) as fdesc:
+                data = load(fdesc)
+        except (IOError, OSError, ValueError):
+            data = {}
+        self.outcomes = data.get('outcomes', {})
+        self.ranking = data.get('ranking', [])
+        self.sessions = data.get('sessions', 0)
+
+    def record(self, method, success, confirmed=True):
+        ''' Record whether turning the display off or on using a method succeeded, and whether it confirmed it did '''
+        outcomes = self.outcomes.setdefault(method, dict(success=0, failure=0))
+        outcomes['success' if success else 'failure'] += 1
+        if success and not confirmed:
+            outcomes['unconfirmed'] = outcomes.get('unconfirmed', 0) + 1
+        self.changed = True
+
+    def trials(self, method):
+        ''' Return how many times a method was tried '''
+        outcomes = self.outcomes.get(method, {})
+        return outcomes.get('success', 0) + outcomes.get('failure', 0)
+
+    def trying(self, method):
+        ''' Return whether a method is still being tried '''
+        return self.trials(method) < RANKING_TRIALS * 2  # Every session turns off and on
+
+    def unconfirmed(self, method):
+        ''' Return whether a method ever succeeded without confirming the display reached its state '''
+        return self.outcomes.get(method, {}).get('unconfirmed', 0) > 0
+
+    def success_rate(self, method):
+        ''' Return the fraction of successful attempts, or None when it was never tried '''
+        trials = self.trials(method)
+        return self.outcomes.get(method).get('success') / trials if trials else None
+
+    def rank(self, candidates, stats):
+        ''' Rank the reliable candidates by their median off and on latency '''
+        def latency(method):
+            ''' Return the median time to turn the display off and back on '''
+            return (stats.percentile(method, 'off', 50) or 0) + (stats.percentile(method, 'on', 50) or 0)
+
+        reliable = [method for method in candidates if self.success_rate(method) >= RANKING_SUCCESS_RATE]
+        self.ranking = sorted(reliable, key=lambda method: (self.unconfirmed(method), latency(method)))
+        self.sessions = 0
+        self.changed = True
+        log(2, 'Ranked display methods: {ranking}', ranking=', '.join('%s=%dms' % (method, latency(method)) for method in self.ranking))
+
+    def choose(self, candidates, stats):
+        ''' Return the candidate to use for the next session, or None when none of them is reliable '''
+        self.sessions += 1
+        self.changed = True
+        untried = [method for method in candidates if self.trying(method)]
+        if untried:
+            log(2, "Trying display method '{method}'", method=untried[0])
+            return untried[0]
+        if self.sessions > RANKING_SESSIONS or not set(self.ranking) <= set(candidates) or not self.ranking:
+            self.rank(candidates, stats)
+        return next(iter(self.ranking), None)
+
+    def fallback(self, candidates, method):
+        ''' Return the candidate to fall back on while trying a method, the best one known to work or else the next one to try '''
+        known = [candidate for candidate in self.ranking + sorted(candidates, key=self.unconfirmed)
+                 if candidate in candidates and not self.trying(candidate) and self.success_rate(candidate) >= RANKING_SUCCESS_RATE]
+        untried = [candidate for candidate in candidates if self.trying(candidate)]
+        return next((candidate for candidate in known + untried if candidate != method), None)
+
+    def save(self):
+        ''' Write the outcomes and ranking to the add-on profile, if anything changed '''
+        from json import dump
+        if not self.changed:
+            return
+        with open(self.path, 'w') as fdesc:
+            dump(dict(outcomes=self.outcomes, ranking=self.ranking, sessions=self.sessions), fdesc)
+        self.changed = False
@@ -9,225 +9,270 @@ import atexit
 from xbmc import Monitor
 from xbmcgui import WindowXMLDialog
 
+from kodiutils import (LOG_BUFFER, TRACER, JsonRpcBatch, activate_window, addon_id, addon_path, addon_profile, get_settings,
+                       log, log_error, notification, set_mute)
+# NOTE: jsonrpc() is used by POWER_METHODS through func()
+from kodiutils import jsonrpc  # noqa: F401; pylint: disable=unused-import
+from actions import ActionError, ActionExecutor, DurationStats, Timeline
+from handles import SysfsAttribute, close_devices
+# NOTE: The functions of these display and power methods are used through func()
+from handles import (ddc_monitor, ddc_power_state, dpms_state, drm_dpms, drm_dpms_state, logind,  # noqa: F401; pylint: disable=unused-import
+                     logind_power_off, set_ddc_power, set_dpms, set_drm_dpms, x_display)
+from hedge import Hedge
+from methods import DISPLAY_METHODS, POWER_METHODS
+from profiler import PROFILER
+
+try:  # Python 3
+    from time import monotonic as timer
+except ImportError:  # Python 2
+    from time import time as timer
+
 # NOTE: The below order relates to resources/settings.xml
-DISPLAY_METHODS = [
-    dict(name='do-nothing', title='Do nothing',
-         function='log',
-         args_off=[2, 'Do nothing to power off display'],
-         args_on=[2, 'Do nothing to power back on display']),
-    dict(name='cec-builtin', title='CEC (buil-in)',
-         function='run_builtin',
-         args_off=['CECStandby'],
-         args_on=['CECActivateSource']),
-    dict(name='no-signal-rpi', title='No Signal on Raspberry Pi (using vcgencmd)',
-         function='run_command',
-         args_off=['vcgencmd', 'display_power', '0'],
-         args_on=['vcgencmd', 'display_power', '1']),
-    dict(name='dpms-builtin', title='DPMS (built-in)',
-         function='run_builtin',
-         args_off=['ToggleDPMS'],
-         args_on=['ToggleDPMS']),
-    dict(name='dpms-xset', title='DPMS (using xset)',
-         function='run_command',
-         args_off=['xset', 'dpms', 'force', 'off'],
-         args_on=['xset', 'dpms', 'force', 'on']),
-    dict(name='dpms-vbetool', title='DPMS (using vbetool)',
-         function='run_command',
-         args_off=['vbetool', 'dpms', 'off'],
-         args_on=['vbetool', 'dpms', 'on']),
-    # TODO: This needs more outside testing
-    dict(name='dpms-xrandr', title='DPMS (using xrandr)',
-         function='run_command',
-         args_off=['xrandr', '--output CRT-0', 'off'],
-         args_on=['xrandr', '--output CRT-0', 'on']),
-    # TODO: This needs more outside testing
-    dict(name='cec-android', title='CEC on Android (kernel)',
-         function='run_command',
-         args_off=['su', '-c', 'echo 0 >/sys/devices/virtual/graphics/fb0/cec'],
-         args_on=['su', '-c', 'echo 1 >/sys/devices/virtual/graphics/fb0/cec']),
-    # NOTE: Contrary to what one might think, 1 means off and 0 means on
-    dict(name='backlight-rpi', title='Backlight on Raspberry Pi (kernel)',
-         function='run_command',
-         args_off=['su', '-c', 'echo 1 >/sys/class/backlight/rpi_backlight/bl_power'],
-         args_on=['su', '-c', 'echo 0 >/sys/class/backlight/rpi_backlight/bl_power']),
-    dict(name='backlight-odroid-c2', title='Backlight on Odroid C2 (kernel)',
-         function='run_command',
-         args_off=['su', '-c', 'echo 0 >/sys/class/amhdmitx/amhdmitx0/phy'],
-         args_on=['su', '-c', 'echo 1 >/sys/class/amhdmitx/amhdmitx0/phy']),
-]
-
-POWER_METHODS = [
-    dict(name='do-nothing', title='Do nothing',
-         function='log', kwargs_off=dict(level=2, message='Do nothing to power off system')),
-    dict(name='suspend-builtin', title='Suspend (built-in)',
-         function='jsonrpc', kwargs_off=dict(method='System.Suspend')),
-    dict(name='hibernate-builtin', title='Hibernate (built-in)',
-         function='jsonrpc', kwargs_off=dict(method='System.Hibernate')),
-    dict(name='quit-builtin', title='Quit (built-in)',
-         function='jsonrpc', kwargs_off=dict(method='Application.Quit')),
-    dict(name='shutdown-builtin', title='ShutDown action (built-in)',
-         function='jsonrpc', kwargs_off=dict(method='System.Shutdown')),
-    dict(name='reboot-builtin', title='Reboot (built-in)',
-         function='jsonrpc', kwargs_off=dict(method='System.Reboot')),
-    dict(name='powerdown-builtin', title='Powerdown (built-in)',
-         function='jsonrpc', kwargs_off=dict(method='System.Powerdown')),
-]
-
-
-class SafeDict(dict):
-    ''' A safe dictionary implementation that does not break down on missing keys '''
-    def __missing__(self, key):
-        ''' Replace missing keys with the original placeholder '''
-        return '{' + key + '}'
-
-
-def from_unicode(text, encoding='utf-8'):
-    ''' Force unicode to text '''
-    if sys.version_info.major == 2 and isinstance(text, unicode):  # noqa: F821; pylint: disable=undefined-variable
-        return text.encode(encoding)
-    return text
-
-
-def to_unicode(text, encoding='utf-8'):
-    ''' Force text to unicode '''
-    return text.decode(encoding) if isinstance(text, bytes) else text
-
-
-def addon_icon():
-    ''' Cache and return VRT NU Add-on icon '''
-    if not hasattr(addon_icon, 'cached'):
-        from xbmcaddon import Addon
-        addon_icon.cached = to_unicode(Addon().getAddonInfo('icon'))
-    return getattr(addon_icon, 'cached')
-
-
-def addon_id():
-    ''' Cache and return VRT NU Add-on ID '''
-    if not hasattr(addon_id, 'cached'):
-        from xbmcaddon import Addon
-        addon_id.cached = to_unicode(Addon().getAddonInfo('id'))
-    return getattr(addon_id, 'cached')
-
-
-def addon_name():
-    ''' Cache and return VRT NU Add-on name '''
-    if not hasattr(addon_name, 'cached'):
-        from xbmcaddon import Addon
-        addon_name.cached = to_unicode(Addon().getAddonInfo('name'))
-    return getattr(addon_name, 'cached')
-
-
-def addon_path():
-    ''' Cache and return VRT NU Add-on path '''
-    if not hasattr(addon_path, 'cached'):
-        from xbmcaddon import Addon
-        addon_path.cached = to_unicode(Addon().getAddonInfo('path'))
-    return getattr(addon_path, 'cached')
-
-
-def log(level=1, message='', **kwargs):
-    ''' Log info messages to Kodi '''
-    if not hasattr(log, 'debug_logging'):
-        log.debug_logging = get_global_setting('debug.showloginfo')  # Returns a boolean
-    max_log_level = int(get_setting('max_log_level', 0))
-    if not getattr(log, 'debug_logging') and not (level <= max_log_level and max_log_level != 0):
-        return
-    if kwargs:
-        from string import Formatter
-        message = Formatter().vformat(message, (), SafeDict(**kwargs))
-    message = '[{addon}] {message}'.format(addon=addon_id(), message=message)
-    from xbmc import log as xlog
-    xlog(from_unicode(message), level % 3 if getattr(log, 'debug_logging') else 2)
-
-
-def log_error(message, **kwargs):
-    ''' Log error messages to Kodi '''
-    if kwargs:
-        from string import Formatter
-        message = Formatter().vformat(message, (), SafeDict(**kwargs))
-    message = '[{addon}] {message}'.format(addon=addon_id(), message=message)
-    from xbmc import log as xlog
-    xlog(from_unicode(message), 4)
-
-
-def jsonrpc(**kwargs):
-    ''' Perform JSONRPC calls '''
-    from json import dumps, loads
-    from xbmc import executeJSONRPC
-    if 'id' not in kwargs:
-        kwargs.update(id=1)
-    if 'jsonrpc' not in kwargs:
-        kwargs.update(jsonrpc='2.0')
-    result = loads(executeJSONRPC(dumps(kwargs)))
-    if hasattr(log, 'debug_logging'):
-        log(3, "Sending JSON-RPC payload: '{payload}' returns '{result}'", payload=kwargs, result=result)
-    return result
-
-
-def get_setting(setting_id, default=None):
-    ''' Get an add-on setting '''
-    from xbmcaddon import Addon
-    value = to_unicode(Addon().getSetting(setting_id))
-    if value == '' and default is not None:
-        return default
-    return value
-
-
-def get_global_setting(setting):
-    ''' Get a Kodi setting '''
-    result = jsonrpc(method='Settings.GetSettingValue', params=dict(setting=setting))
-    return result.get('result', {}).get('value')
-
-
-def notification(heading='', message='', icon='', time=4000):
-    ''' Show a Kodi notification '''
-    from xbmcgui import Dialog
-    if not heading:
-        heading = addon_name()
-    if not icon:
-        icon = addon_icon()
-    Dialog().notification(heading=heading, message=message, icon=icon, time=time)
-
-
-def set_mute(toggle=True):
-    ''' Set mute using Kodi JSON-RPC interface '''
-    jsonrpc(method='Application.SetMute', params=dict(mute=toggle))
-
-
-def activate_window(window='home'):
-    ''' Set mute using Kodi JSON-RPC interface '''
-#    result = jsonrpc(method='GUI.ActivateWindow', params=dict(window=window, parameters=['Home']))
-    jsonrpc(method='GUI.ActivateWindow', params=dict(window=window))
+RESUME_PARALLEL = 0  # Unmute audio and turn on display at the same time
+RESUME_DISPLAY_FIRST = 1  # Turn on display before doing anything else
+RESUME_DISPLAY_CONFIRMED = 2  # Turn on display first, unmute audio once the display reports it is on
+
+FALLBACK_HEDGE = 0  # Start the fallback display method when the preferred method did not turn the display off in time
+FALLBACK_RACE = 1  # Start all display methods at once, the first one that turns the display off wins
+
+# Maximum number of seconds to wait for the display to report it is on before unmuting audio
+DISPLAY_ON_TIMEOUT = 10
+
+# Number of seconds to wait between turning off the display and powering off the system
+POWER_OFF_DELAY = 1
+
+# When waiting for the display to be off, the minimum and maximum number of seconds to wait
+POWER_OFF_DELAY_MIN = 0.5
+DISPLAY_OFF_TIMEOUT = 10
+
+# Home window property that tells the screensaver entry point the service is ready, see default.py
+SERVICE_PROPERTY = 'screensaver.turnoff.service'
+
+# Maximum number of seconds to wait for the helper process to start
+HELPER_START_TIMEOUT = 5
+
+# Number of seconds to wait before trying the helper process again after it failed, doubled after every failure
+HELPER_RETRY_DELAY = 5
+HELPER_RETRY_DELAY_MAX = 300
+
+# Sysfs attributes kept open during a screensaver session
+SYSFS_ATTRIBUTES = {}
 
 
 def run_builtin(builtin):
     ''' Run Kodi builtins while catching exceptions '''
     from xbmc import executebuiltin
     log(2, "Executing builtin '{builtin}'", builtin=builtin)
-    executebuiltin(builtin, True)
+    with TRACER.span('run_builtin', builtin):
+        executebuiltin(builtin, True)
+
+
+def helper_commands():
+    ''' Return the commands the helper process is allowed to run '''
+    return [method.get(args) for method in DISPLAY_METHODS if method.get('function') == 'run_command' for args in ('args_off', 'args_on')]
+
+
+def helper_interpreter():
+    ''' Return the Python interpreter to run the helper with, or None when Kodi embeds Python without one (e.g. LibreELEC, Android) '''
+    import os
+    executable = sys.executable or ''
+    if os.path.basename(executable).startswith('python') and os.access(executable, os.X_OK):
+        return executable
+    return None
+
+
+def start_helper(path, interpreter):
+    ''' Start the helper process, it only accepts the commands of our display methods '''
+    import os
+    import subprocess
+    from json import dumps
+    commands = helper_commands()
+    command = [interpreter, os.path.join(addon_path(), 'helper.py'), path, dumps(commands)]
+    if get_settings().command_helper_su:
+        try:  # Python 3
+            from shlex import quote
+        except ImportError:  # Python 2
+            from pipes import quote  # pylint: disable=deprecated-module
+        command = ['su', '-c', ' '.join(quote(arg) for arg in command + [str(os.getuid())])]
+    # Detach the helper from Kodi, so it is reused by the next screensaver session
+    if sys.version_info.major == 3:
+        kwargs = dict(start_new_session=True)
+    else:
+        kwargs = dict(preexec_fn=os.setsid)  # pylint: disable=subprocess-popen-preexec-fn
+    log(2, "Starting helper process '{command}'", command=' '.join(command))
+    with open(os.devnull, 'wb') as devnull:
+        subprocess.Popen(command, stdin=devnull, stdout=devnull, stderr=devnull, close_fds=True, **kwargs)
+
+
+def connect_helper():
+    ''' Connect to the helper process, starting it when it is not running yet '''
+    import os
+    import socket
+    from helper import HelperClient
+    if not hasattr(socket, 'AF_UNIX'):
+        log(2, 'Helper process is not supported on this platform')
+        return None
+    path = os.path.join(addon_profile(), 'helper.sock')
+    try:
+        return HelperClient(path)
+    except socket.error:
+        pass
+    interpreter = helper_interpreter()
+    if interpreter is None:
+        log(2, "Helper process is not supported, '{executable}' is not a Python interpreter", executable=sys.executable)
+        return None
+    try:
+        start_helper(path, interpreter)
+    except OSError as exc:
+        log_error("Exception starting helper process: {exc}", exc=exc)
+        return None
+    deadline = timer() + HELPER_START_TIMEOUT
+    while timer() < deadline:
+        try:
+            return HelperClient(path)
+        except socket.error:
+            Monitor().waitForAbort(0.1)
+    log_error('Helper process did not start within {timeout}s', timeout=HELPER_START_TIMEOUT)
+    return None
+
+
+def helper_client():
+    ''' Cache and return a connection to the helper process, or None when it is not available until we try again '''
+    if not hasattr(helper_client, 'cached'):
+        retry, delay = getattr(helper_client, 'retry', (0, HELPER_RETRY_DELAY))
+        if timer() < retry:
+            return None
+        client = connect_helper()
+        if client is None:
+            log(2, 'Helper process is not available, trying again in {delay}s', delay=delay)
+            helper_client.retry = (timer() + delay, min(delay * 2, HELPER_RETRY_DELAY_MAX))
+            return None
+        helper_client.retry = (0, HELPER_RETRY_DELAY)
+        helper_client.cached = client
+    return getattr(helper_client, 'cached')
+
+
+def run_helper(command, timeout=None):
+    ''' Run a command using the helper process, returns None when the helper is not available '''
+    client = helper_client()
+    if client is None:
+        return None
+    try:
+        return client.run(command, timeout)
+    except (IOError, OSError, ValueError) as exc:
+        log(2, 'Lost connection to helper process: {exc}', exc=exc)
+        client.close()
+        del helper_client.cached
+        return None
+
+
+def spawn_command(command, timeout=None, **kwargs):
+    ''' Run a command in a new process, killing it when it takes longer than the timeout (in seconds) '''
+    from helper import execute
+    return execute(command, timeout, **kwargs)
 
 
 def run_command(*command, **kwargs):
     ''' Run commands on the OS while catching exceptions '''
-    import subprocess
     # TODO: Add options for running using su or sudo
+    timeout = get_settings().action_timeout
+    response = None
+    with TRACER.span('run_command', ' '.join(command)):
+        if get_settings().command_helper and not kwargs and list(command) in helper_commands():
+            response = run_helper(command, timeout)
+        if response is None:
+            response = spawn_command(command, timeout=timeout, **kwargs)
+    if response.get('timeout'):
+        log_error("Command '{command}' was killed after {duration}ms, it overran its budget of {timeout}s",
+                  command=' '.join(command), duration=response.get('duration'), timeout=timeout)
+        return
+    if 'error' in response:
+        log_error("Exception running '{command}': {exc}", command=command[0], exc=response.get('error'))
+        notification(message="Exception running '%s': %s" % (command[0], response.get('error')))
+        raise ActionError("Exception running '%s': %s" % (command[0], response.get('error')))
+    if response.get('rc') == 0:
+        log(2, "Running command '{command}' returned rc={rc} in {duration}ms", command=' '.join(command), **response)
+        return
+    out = response.get('output')
+    log_error("Running command '{command}' failed with rc={rc}", command=' '.join(command), rc=response.get('rc'))
+    if out:
+        log_error("Command '{command}' returned on stdout: {stdout} ", command=command[0], stdout=out)
+    notification(message=out)
+    raise ActionError("Running command '%s' failed with rc=%s" % (' '.join(command), response.get('rc')))
+
+
+def sysfs_attribute(path):
+    ''' Cache and return an open sysfs attribute for the rest of the screensaver session '''
+    if path not in SYSFS_ATTRIBUTES:
+        SYSFS_ATTRIBUTES[path] = SysfsAttribute(path)
+    return SYSFS_ATTRIBUTES.get(path)
+
+
+def close_sysfs():
+    ''' Close all sysfs attributes that were opened during this session '''
+    while SYSFS_ATTRIBUTES:
+        SYSFS_ATTRIBUTES.popitem()[1].close()
+
+
+def write_sysfs(path, value):
+    ''' Write a value to a sysfs attribute, falling back to su when we are not allowed to '''
     try:
-        cmd = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, shell=False, **kwargs)
-        (out, err) = cmd.communicate()
-        if cmd.returncode == 0:
-            log(2, "Running command '{command}' returned rc={rc}", command=' '.join(command), rc=cmd.returncode)
-        else:
-            log_error("Running command '{command}' failed with rc={rc}", command=' '.join(command), rc=cmd.returncode)
-            if err:
-                log_error("Command '{command}' returned on stderr: {stderr}", command=command[0], stderr=err)
-            if out:
-                log_error("Command '{command}' returned on stdout: {stdout} ", command=command[0], stdout=out)
-            notification(message="%s\n%s" % (out, err))
-            sys.exit(1)
-    except OSError as exc:
-        log_error("Exception running '{command}': {exc}", command=command[0], exc=exc)
-        notification(message="Exception running '%s': %s" % (command[0], exc))
-        sys.exit(2)
+        latency = sysfs_attribute(path).write(value)
+    except (IOError, OSError) as exc:
+        log(2, "Cannot write to '{path}' directly, using su instead: {exc}", path=path, exc=exc)
+        run_command('su', '-c', 'echo %s >%s' % (value, path))
+        return
+    log(2, "Writing '{value}' to '{path}' took {latency:.2f}ms", value=value, path=path, latency=latency)
+
+
+def sysfs_state(path, value_on):
+    ''' Return whether a sysfs attribute holds its on value, or None if it cannot be read '''
+    try:
+        value = sysfs_attribute(path).read()
+    except (IOError, OSError):
+        return None
+    return None if value is None else value == value_on
+
+
+def query_outputs():
+    ''' Return the output of 'xrandr --query' '''
+    response = spawn_command(['xrandr', '--query'], timeout=get_settings().action_timeout)
+    if response.get('rc') != 0:
+        log_error("Cannot list outputs using xrandr: {error}", error=response.get('error') or response.get('output'))
+        return ''
+    return response.get('output')
+
+
+def display_outputs():
+    ''' Cache and return the connected outputs for the rest of the screensaver session '''
+    if not hasattr(display_outputs, 'cached'):
+        from outputs import Outputs
+        display_outputs.cached = Outputs(query_outputs)
+    return getattr(display_outputs, 'cached')
+
+
+def set_outputs(mode):
+    ''' Switch all selected outputs off or on at once
+
+    Switching an output off using xrandr disables its CRTC, so Kodi lays out its GUI again when it is back on.
+    When all outputs are to be switched, X11 DPMS is used instead where it is usable, which leaves the outputs configured.
+    '''
+    from outputs import xrandr_command
+    settings = get_settings()
+    if not settings.outputs and capabilities().usable('display', next(method for method in DISPLAY_METHODS if method.get('name') == 'dpms-x11'))[0]:
+        set_dpms(mode)
+        return
+    outputs = display_outputs().connected(settings.outputs)
+    if not outputs:
+        log_error('No connected outputs found to turn {mode}', mode=mode)
+        return
+    run_command(*xrandr_command(outputs, mode))
+
+
+def close_handles():
+    ''' Close all handles that were opened during this session '''
+    close_devices()
+    close_sysfs()
 
 
 def func(function, *args, **kwargs):
@@ -235,78 +280,606 @@ def func(function, *args, **kwargs):
     return globals()[function](*args, **kwargs)
 
 
-class TurnOffDialog(WindowXMLDialog, object):
-    ''' The TurnOffScreensaver class managing the XML gui '''
-
-    def __init__(self, *args):  # pylint: disable=super-init-not-called,unused-argument
-        ''' Initialize dialog '''
+def turn_display_off(method):
+    ''' Turn off the display using a method, and return whether it reported the display is off, or None if it cannot tell '''
+    func(method.get('function'), *method.get('args_off'))
+    return wait_for_display(method, False, DISPLAY_OFF_TIMEOUT)
+
+
+def wait_for_display(method, state, timeout):
+    ''' Wait until a display method reports the display is on (True) or off (False), returns None if it cannot tell '''
+    if not method.get('function_state'):
+        return None
+    monitor = Monitor()
+    deadline = timer() + timeout
+    while True:
+        current = func(method.get('function_state'), *method.get('args_state', []))
+        if current is None:
+            return None
+        if current == state:
+            return True
+        if timer() >= deadline or monitor.waitForAbort(0.1):
+            return False
+
+
+def display_off_delay(method):
+    ''' Return how long to wait for a display method that cannot report the display is off, based on how long it usually takes '''
+    p95 = duration_stats().percentile(method.get('name'), 'off', 95)
+    if p95 is None:
+        return POWER_OFF_DELAY
+    return min(max(p95 / 1000, POWER_OFF_DELAY_MIN), DISPLAY_OFF_TIMEOUT)
+
+
+def usage_patterns():
+    ''' Cache and return when the screensaver is usually deactivated '''
+    if not hasattr(usage_patterns, 'cached'):
+        import os
+        from prewake import UsagePatterns
+        usage_patterns.cached = UsagePatterns(os.path.join(addon_profile(), 'prewake.json'))
+    return getattr(usage_patterns, 'cached')
+
+
+def device_state():
+    ''' Cache and return the state we left the display and audio in '''
+    if not hasattr(device_state, 'cached'):
+        import os
+        from state import DeviceState
+        device_state.cached = DeviceState(os.path.join(addon_profile(), 'state.json'))
+    return getattr(device_state, 'cached')
+
+
+def reconcile_state(restore=False):
+    ''' Reconcile the state a session that never resumed left behind, turning the display on and unmuting audio when restoring '''
+    state = device_state()
+    stale = state.stale()
+    if not stale:
+        return
+    log(2, 'Reconciling stale state: {states}', states=', '.join('%s is %s' % (device, state.get(device)) for device in stale))
+    if 'display' in stale:
+        method = next((method for method in DISPLAY_METHODS if method.get('name') == state.method), DISPLAY_METHODS[0])
+        current = wait_for_display(method, True, 0)
+        if current:
+            state.end('display', 'on')
+        # Toggling the display cannot be undone blindly, Kodi turns its own DPMS off on input anyway
+        elif restore and capabilities().usable('display', method)[0] and (current is False or method.get('args_on') != method.get('args_off')):
+            log(1, "Turn display back on using method '{name}'", **method)
+            try:
+                func(method.get('function'), *method.get('args_on'))
+                state.end('display', 'on')
+            except ActionError:
+                state.end('display', 'unknown')
+        else:
+            state.end('display', 'unknown')  # Nothing we send next is skipped
+    if 'audio' in stale:
+        if restore:
+            log(1, 'Unmute audio')
+            set_mute(toggle=False)
+            state.end('audio', 'unmuted')
+        elif state.get('audio') != 'muted':  # Kodi remembers it was muted, but not whether muting ever happened
+            state.end('audio', 'unknown')
+
+
+def duration_stats():
+    ''' Cache and return the recorded durations of display and power methods '''
+    if not hasattr(duration_stats, 'cached'):
+        import os
+        duration_stats.cached = DurationStats(os.path.join(addon_profile(), 'durations.json'))
+    return getattr(duration_stats, 'cached')
+
+
+def capabilities():
+    ''' Cache and return which display and power methods can work on this system '''
+    if not hasattr(capabilities, 'cached'):
+        import os
+        from probe import Capabilities
+        capabilities.cached = Capabilities(os.path.join(addon_profile(), 'capabilities.json'), dict(display=DISPLAY_METHODS, power=POWER_METHODS))
+    return getattr(capabilities, 'cached')
+
+
+def method_ranking():
+    ''' Cache and return the ranking of display methods for the automatic selection '''
+    if not hasattr(method_ranking, 'cached'):
+        import os
+        from ranking import Ranking
+        method_ranking.cached = Ranking(os.path.join(addon_profile(), 'ranking.json'))
+    return getattr(method_ranking, 'cached')
+
+
+def auto_candidates():
+    ''' Return the usable display methods for the automatic selection, those that can report the display state are tried first '''
+    usable = [method for method in DISPLAY_METHODS
+              if method.get('name') not in ('auto', 'do-nothing') and capabilities().usable('display', method)[0]]
+    return sorted(usable, key=lambda method: not method.get('function_state'))
+
+
+def auto_display_method():
+    ''' Return the display method to use when it is selected automatically
+
+    Methods that cannot report the display state are ranked by whether they returned without an error in time,
+    and after those that confirmed they worked. Without a reliable one, the first usable method that does not toggle is used.
+    '''
+    candidates = auto_candidates()
+    name = method_ranking().choose([method.get('name') for method in candidates], duration_stats())
+    method = next((method for method in candidates if method.get('name') == name), None)
+    if method is None:
+        method = next((method for method in candidates if method.get('args_on') != method.get('args_off')), DISPLAY_METHODS[0])
+        log(2, "No display method is known to work reliably, using '{name}'", name=method.get('name'))
+        return method
+    log(2, "Selected display method '{name}' automatically", name=name)
+    return method
+
+
+def trial_fallback(display):
+    ''' Return the method to fall back on while the automatic selection tries a display method, so a bad one never leaves the display on '''
+    if not method_ranking().trying(display.get('name')):
+        return DISPLAY_METHODS[0]
+    candidates = auto_candidates()
+    name = method_ranking().fallback([method.get('name') for method in candidates], display.get('name'))
+    return next((method for method in candidates if method.get('name') == name), DISPLAY_METHODS[0])
+
+
+def display_chain(display, auto=False):
+    ''' Return the display methods to try in order, the preferred method and its fallback '''
+    fallback = DISPLAY_METHODS[get_settings().fallback_method]
+    if auto and fallback.get('name') in ('auto', 'do-nothing', display.get('name')):
+        fallback = trial_fallback(display)
+    if fallback.get('name') in ('auto', 'do-nothing', display.get('name')):
+        return [display]
+    usable, reason = capabilities().usable('display', fallback)
+    if not usable:
+        log(2, "Not using fallback display method '{name}': {reason}", name=fallback.get('name'), reason=reason)
+        return [display]
+    if display.get('name') == 'do-nothing':  # The preferred method is not usable
+        return [fallback]
+    return [display, fallback]
+
+
+def usable_method(kind, method):
+    ''' Return the method when it can work on this system, otherwise a method that does nothing '''
+    usable, reason = capabilities().usable(kind, method)
+    if usable:
+        return method
+    log_error("Skipping {kind} method '{name}': {reason}", kind=kind, name=method.get('name'), reason=reason)
+    notification(message="Skipping %s method '%s': %s" % (kind, method.get('title'), reason))
+    return (DISPLAY_METHODS if kind == 'display' else POWER_METHODS)[0]
+
+
+class TurnOff(object):
+    ''' Turn off display and system for a single screensaver session, and turn them back on '''
+
+    def __init__(self, monitor=True):
+        ''' Initialize session, without a monitor the caller is responsible for calling resume() '''
+        from threading import Event, Lock
+        self.activated = None
+        self.auto = False
+        self.awake = False
+        self.chain = []
+        self.confirmed = None
+        self.deactivated = Event()
         self.display = None
+        self.fired = []
+        self.lock = Lock()
+        self.listener = None
         self.logoff = None
         self.monitor = None
+        self.monitor_deactivation = monitor
         self.mute = None
         self.power = None
-        atexit.register(self.exit)
-
-    def onInit(self):  # pylint: disable=invalid-name
-        ''' Perform this when the screensaver is started '''
-        self.logoff = get_setting('logoff', 'false')
-        self.mute = get_setting('mute', 'true')
-
-        display_method = int(get_setting('display_method', 0))
-        self.display = DISPLAY_METHODS[display_method]
-
-        power_method = int(get_setting('power_method', 0))
-        self.power = POWER_METHODS[power_method]
+        self.prewake_timer = None
+        self.prewoken = None
+        self.results = {}
+        self.settled = True
+        self.timeline = None
+        self.waking = None
+
+    def activate(self):
+        ''' Perform this when the screensaver is started, and turn back on once done when it was deactivated meanwhile '''
+        with self.lock:
+            self.settled = False
+        turned_off = None  # Stays None when turning off raised
+        try:
+            turned_off = self.turn_off()
+        finally:
+            with self.lock:
+                self.settled = True
+            if turned_off is None and self.deactivated.is_set():
+                log(2, 'Screensaver was deactivated while turning off failed, turning back on')
+                self.resume()
+        if not turned_off:
+            self.exit()
+        elif self.deactivated.is_set():
+            log(2, 'Screensaver was deactivated while turning off, turning back on')
+            self.resume()
+
+    def select_methods(self, settings):
+        ''' Select the display methods to try and the power method for this session '''
+        self.display = DISPLAY_METHODS[settings.display_method]
+        self.auto = self.display.get('name') == 'auto'
+        if self.auto:
+            self.display = auto_display_method()
+        self.display = usable_method('display', self.display)
+        self.chain = display_chain(self.display, self.auto)
+        self.display = self.chain[0]
+        self.power = usable_method('power', POWER_METHODS[settings.power_method])
+
+    def turn_off(self):
+        ''' Turn off display and system after the grace period, returns False when the screensaver was deactivated within it '''
+        import time
+        settings = get_settings()
+        self.activated = time.time()
+        self.monitor = TurnOffMonitor(action=self.resume) if self.monitor_deactivation else Monitor()
+        reconcile_state()
+        self.logoff = settings.logoff
+        self.mute = settings.mute
+        self.select_methods(settings)
+        TRACER.start('activate', display=self.display.get('name'), power=self.power.get('name'))
+        PROFILER.start('activate')
 
         log(3, 'display_method={display}, power_method={power}, logoff={logoff}, mute={mute}',
             display=self.display.get('name'), power=self.power.get('name'), logoff=self.logoff, mute=self.mute)
 
+        # Someone who is still there, e.g. wiggling the remote, deactivates the screensaver before anything is turned off
+        if self.grace(settings.grace_period):
+            log(1, 'Screensaver was deactivated within the grace period of {grace}s, nothing was turned off', grace=settings.grace_period)
+            PROFILER.finish()
+            TRACER.finish('cancelled')
+            return False
+
         # Turn off display
         if self.display.get('name') != 'do-nothing':
             log(1, "Turn display off using method '{name}'", **self.display)
-        func(self.display.get('function'), *self.display.get('args_off'))
+
+        # Log off user and mute audio using a single JSON-RPC request
+        batch = JsonRpcBatch()
 
         # FIXME: Screensaver always seems to lock when started, requires unlock and re-login
         # Log off user
-        if self.logoff == 'true':
+        if self.logoff:
             log(1, 'Log off user')
 #            run_builtin('System.LogOff')
-            activate_window('loginscreen')
+            activate_window('loginscreen', batch=batch)
 #            run_builtin('ActivateWindow(loginscreen)')
 #            run_builtin('ActivateWindowAndFocus(loginscreen,return)')
 
         # Mute audio
-        if self.mute == 'true':
+        muting = self.mute and device_state().begin('audio', 'muted')
+        if muting:
             log(1, 'Mute audio')
-            set_mute(toggle=True)
-
-        self.monitor = TurnOffMonitor(action=self.resume)
-        self.monitor.waitForAbort(1)
+            set_mute(toggle=True, batch=batch)
+
+        # Budgets cover the waits an action does on top of running its method
+        executor = ActionExecutor(budget=settings.action_timeout)
+        executor.add('display', self.display_off, budget=settings.action_timeout + (DISPLAY_OFF_TIMEOUT if self.auto or len(self.chain) > 1 else 0))
+        executor.add('jsonrpc', self.send, batch, 'muted' if muting else None)
+        executor.add('power', self.power_off, after=('display', 'jsonrpc'), budget=settings.action_timeout + max(DISPLAY_OFF_TIMEOUT, POWER_OFF_DELAY))
+        outcome = 'failed'
+        try:
+            with PROFILER.thread():
+                executor.run()
+            outcome = executor.outcome()
+        finally:
+            PROFILER.finish()
+            self.record('off', executor)
+            TRACER.finish(outcome)
+
+        if self.deactivated.is_set():
+            return True
+        if settings.wake_listener and self.display.get('name') != 'do-nothing':
+            from wake import WakeListener
+            self.listener = WakeListener(self.wake)
+            if not self.listener.start():
+                self.listener = None
+        self.schedule_prewake()
+        return True
+
+    def grace(self, period):
+        ''' Wait for the grace period, returns whether the screensaver was deactivated (or Kodi exits) in the meantime '''
+        deadline = timer() + period
+        while not self.deactivated.is_set() and timer() < deadline:
+            # NOTE: Waiting for abort lets Kodi call us back when the screensaver is deactivated
+            if self.monitor.waitForAbort(max(min(deadline - timer(), 0.1), 0)):
+                return True
+        return self.deactivated.is_set()
+
+    def schedule_prewake(self):
+        ''' Turn the display on shortly before the next time the screensaver is usually deactivated '''
+        import time
+        from threading import Timer
+        settings = get_settings()
+        if not settings.prewake or self.display.get('name') == 'do-nothing':
+            return
+        predicted = usage_patterns().next_wake(time.time(), settings.prewake_confidence / 100)
+        if predicted is None:
+            return
+        self.prewake_timer = Timer(max(0, predicted - settings.prewake_lead - time.time()), self.prewake)
+        self.prewake_timer.daemon = True
+        self.prewake_timer.start()
+
+    def prewake(self):
+        ''' Turn the display on ahead of a predicted wake, Kodi stays in screensaver mode '''
+        import time
+        from threading import Timer
+        from prewake import PREWAKE_SLOT
+        with self.lock:
+            if self.awake:
+                return
+            self.prewoken = time.time()
+        log(1, "Turn display on ahead of predicted wake using method '{name}'", **self.display)
+        self.timeline = Timeline()
+        try:
+            self.display_on()
+        except ActionError:
+            return  # The method logged why, the display state is reconciled at the next activation
+        # Someone is expected within the slot
+        self.prewake_timer = Timer(get_settings().prewake_lead + PREWAKE_SLOT * 60, self.prewake_missed)
+        self.prewake_timer.daemon = True
+        self.prewake_timer.start()
+
+    def prewake_missed(self):
+        ''' Turn the display off again when nobody came back after all '''
+        with self.lock:
+            if self.awake:
+                return
+            log(1, "Nobody returned, turn display off again using method '{name}'", **self.display)
+            if device_state().begin('display', 'off'):
+                try:
+                    func(self.display.get('function'), *self.display.get('args_off'))
+                    device_state().end('display', 'off', method=self.display.get('name'))
+                except ActionError:
+                    device_state().end('display', 'unknown')
+            self.prewoken = self.timeline = self.waking = None
+        usage_patterns().outcome('misses')
+        self.schedule_prewake()
+
+    def cancel_prewake(self):
+        ''' Someone is there, stop any pre-wake that is scheduled '''
+        with self.lock:
+            self.awake = True
+        if self.prewake_timer is not None:
+            self.prewake_timer.cancel()
+
+    def record_usage(self):
+        ''' Record when the screensaver was deactivated, and whether the display was turned on ahead of time '''
+        import time
+        if not get_settings().prewake or self.activated is None:
+            return
+        now = time.time()
+        usage_patterns().record(self.activated, now)
+        if self.prewoken is not None:
+            usage_patterns().outcome('hits', early=now - self.prewoken)
+        else:
+            usage_patterns().outcome('unpredicted')
+
+    def wake(self):
+        ''' Start turning on the display at the first input event, before Kodi deactivates the screensaver '''
+        self.cancel_prewake()
+        self.timeline = Timeline()
+        TRACER.start('wake', display=self.display.get('name'), early=True)
+        try:
+            self.display_on()
+        except ActionError:
+            pass  # The method logged why, the display state is reconciled at the next activation
+
+    def display_off(self):
+        ''' Turn off display, starting the fallback method when the preferred method does not turn it off in time '''
+        self.confirmed = None
+        self.results = {}
+        if not device_state().begin('display', 'off'):
+            self.fired = []
+            return
+        self.fired = self.chain[:1]
+        if len(self.chain) == 1:
+            self.results = {self.display.get('name'): False}  # Until it returns without an error
+            func(self.display.get('function'), *self.display.get('args_off'))
+            device_state().end('display', 'off', method=self.display.get('name'))
+            self.confirm(False)
+            self.results[self.display.get('name')] = self.confirmed
+            return
+        from functools import partial
+        settings = get_settings()
+        hedge = Hedge(settings.fallback_budget, race=settings.fallback_mode == FALLBACK_RACE)
+        winner = hedge.run([(method.get('name'), partial(turn_display_off, method)) for method in self.chain], timeout=DISPLAY_OFF_TIMEOUT)
+        self.fired = [method for method in self.chain if method.get('name') in hedge.started]
+        self.results = dict(hedge.results)
+        if winner is None:
+            log_error("None of the display methods '{names}' turned the display off", names=', '.join(hedge.started))
+            device_state().end('display', 'unknown')  # Nothing we send next is skipped
+            raise ActionError("None of the display methods '%s' turned the display off" % ', '.join(hedge.started))
+        self.display = next(method for method in self.chain if method.get('name') == winner)
+        if winner in hedge.unconfirmed:
+            log(2, "Display method '{name}' was sent, but cannot report the display is off", name=winner)
+        else:
+            log(2, "Display method '{name}' turned the display off", name=winner)
+        device_state().end('display', 'off', method=winner)
+        self.confirm(False)
+
+    def confirm(self, state):
+        ''' Read back whether the display reached its state, the automatic selection ranks confirmed successes first '''
+        if self.auto:
+            self.confirmed = wait_for_display(self.display, state, DISPLAY_ON_TIMEOUT if state else DISPLAY_OFF_TIMEOUT)
+
+    def record(self, action, executor):
+        ''' Record how long turning the display off or on took, and whether the method on trial worked for the automatic selection '''
+        display = executor.action('display')
+        duration_stats().add(self.display.get('name'), action, display.get('duration'))
+        name = self.chain[0].get('name') if self.chain else None
+        if not self.auto or not self.results or name == 'do-nothing' or (action == 'on' and name not in self.results):
+            return  # Nothing was sent, or the fallback turned the display off instead
+        result = self.results.get(name, False)  # It did not return before the fallback won
+        if self.display is self.chain[0] and (display.get('error') is not None or display.get('overrun')):
+            result = False
+        method_ranking().record(name, result is not False, confirmed=result is True)
+
+    def power_off(self):
+        ''' Power off the system once the display is off, unless the screensaver was deactivated in the meantime '''
+        if self.power.get('name') == 'do-nothing' or not get_settings().confirm_display_off:
+            self.monitor.waitForAbort(POWER_OFF_DELAY)
+        else:
+            start = timer()
+            confirmed = wait_for_display(self.display, False, DISPLAY_OFF_TIMEOUT)
+            if confirmed is None:
+                delay = display_off_delay(self.display)
+                log(3, "Display method '{name}' cannot report the display is off, waiting {delay:.2f}s", delay=delay, **self.display)
+                self.monitor.waitForAbort(delay)
+            elif confirmed:
+                log(3, "Display method '{name}' reported the display is off after {duration}ms", duration=int((timer() - start) * 1000), **self.display)
+            else:
+                log(2, "Display method '{name}' did not report the display is off within {timeout}s", timeout=DISPLAY_OFF_TIMEOUT, **self.display)
+
+        # Write out what was logged while the display was turned off
+        LOG_BUFFER.flush()
+
+        if self.deactivated.is_set():
+            log(1, 'Screensaver was deactivated, not turning system off')
+            return
 
         # Power off system
         if self.power.get('name') != 'do-nothing':
             log(1, "Turn system off using method '{name}'", **self.power)
+        start = timer()
         func(self.power.get('function'), **self.power.get('kwargs_off', {}))
+        duration_stats().add(self.power.get('name'), 'off', int((timer() - start) * 1000))
 
     def resume(self):
-        ''' Perform this when the Screensaver is stopped '''
+        ''' Perform this when the Screensaver is stopped, turning off that is still in progress finishes first '''
+        with self.lock:
+            self.deactivated.set()
+            if not self.settled:
+                log(2, 'Screensaver was deactivated, turning back on once turning off is done')
+                return
+        if self.listener is not None:
+            self.listener.stop()
+        self.cancel_prewake()
+        self.record_usage()
+        if self.timeline is None:
+            self.timeline = Timeline()
+        self.timeline.mark('deactivated')
+        TRACER.start('wake', display=self.display.get('name'))
+        TRACER.mark('deactivated')
+        PROFILER.start('wake')
+        settings = get_settings()
+        resume_mode = settings.resume_mode
+        executor = ActionExecutor(budget=settings.action_timeout)
+        # Every method that was started turns the display back on, and a second caller waits for the first
+        display_budget = settings.action_timeout * max(len(self.fired or ()), 1) + DISPLAY_ON_TIMEOUT
+
+        # Turn on display, dispatched first unless both actions are meant to start together
+        if resume_mode != RESUME_PARALLEL:
+            executor.add('display', self.display_on, budget=display_budget)
+
         # Unmute audio
-        if self.mute == 'true':
+        batch = JsonRpcBatch()
+        if self.mute and device_state().begin('audio', 'unmuted'):
             log(1, 'Unmute audio')
-            set_mute(toggle=False)
-
-        # Turn on display
-        if self.display.get('name') != 'do-nothing':
-            log(1, "Turn display back on using method '{name}'", **self.display)
-        func(self.display.get('function'), *self.display.get('args_on'))
+            set_mute(toggle=False, batch=batch)
+        if resume_mode == RESUME_DISPLAY_CONFIRMED:
+            executor.add('jsonrpc', self.unmute, batch, after=('display',), budget=settings.action_timeout + DISPLAY_ON_TIMEOUT)
+        else:
+            executor.add('jsonrpc', self.unmute, batch)
+
+        if resume_mode == RESUME_PARALLEL:
+            executor.add('display', self.display_on, budget=display_budget)
+
+        outcome = 'failed'
+        try:
+            with PROFILER.thread():
+                executor.run()
+            outcome = executor.outcome()
+        finally:
+            PROFILER.finish()
+            self.record('on', executor)
+            TRACER.finish(outcome)
+        self.timeline.mark('done')
+        log(3, 'Resume timeline: {timeline}', timeline=self.timeline)
 
         # Clean up everything
         self.exit()
 
+    def display_on(self):
+        ''' Turn on display, only once when both the wake listener and the deactivation ask for it '''
+        from threading import Event
+        with self.lock:
+            waking, first = self.waking, self.waking is None
+            if first:
+                waking = self.waking = Event()
+        if not first:
+            log(3, 'Display is already being turned on')
+            waking.wait(DISPLAY_ON_TIMEOUT)
+            return
+        try:
+            self.turn_display_on()
+        finally:
+            waking.set()
+
+    def turn_display_on(self):
+        ''' Turn on display using every method that was started '''
+        self.confirmed = None
+        self.results = {}
+        if not device_state().begin('display', 'on'):
+            return
+        if self.display.get('name') != 'do-nothing':
+            log(1, "Turn display back on using method '{name}'", **self.display)
+        self.timeline.mark('display-sent')
+        # Every method that was started has to turn the display back on, the one that turned it off first
+        self.results = {self.display.get('name'): False}  # Until it returns without an error
+        for method in sorted(self.fired or [self.display], key=lambda method: method is not self.display):
+            func(method.get('function'), *method.get('args_on'))
+        device_state().end('display', 'on')
+        self.timeline.mark('display-done')
+        self.confirm(True)
+        self.results[self.display.get('name')] = self.confirmed
+
+    def unmute(self, batch):
+        ''' Unmute audio, after the display reports it is on when requested '''
+        if not batch.requests:
+            return
+        if get_settings().resume_mode == RESUME_DISPLAY_CONFIRMED:
+            if wait_for_display(self.display, True, DISPLAY_ON_TIMEOUT) is False:
+                log(2, "Display method '{name}' did not report the display is on within {timeout}s", timeout=DISPLAY_ON_TIMEOUT, **self.display)
+            self.timeline.mark('display-confirmed')
+        self.send(batch, 'unmuted')
+        self.timeline.mark('unmute-done')
+
+    @staticmethod
+    def send(batch, audio=None):
+        ''' Send the JSON-RPC batch, and store the audio state it leads to '''
+        batch.send()
+        if audio is not None:
+            device_state().end('audio', audio)
+
     def exit(self):
         ''' Clean up function '''
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.cancel_prewake()
         self.monitor = None
+        duration_stats().save()
+        if get_settings().prewake:
+            usage_patterns().save()
+        if self.auto:
+            method_ranking().save()
+        LOG_BUFFER.flush()
+
+
+class TurnOffDialog(WindowXMLDialog, TurnOff):
+    ''' The TurnOffScreensaver class managing the XML gui '''
+
+    def __init__(self, *args):  # pylint: disable=super-init-not-called,unused-argument
+        ''' Initialize dialog '''
+        TurnOff.__init__(self)
+        atexit.register(self.exit)
+
+    def onInit(self):  # pylint: disable=invalid-name
+        ''' Perform this when the screensaver is started '''
+        TRACER.mark('onInit')
+        self.activate()
+
+    def exit(self):
+        ''' Clean up function '''
         self.close()
+        close_handles()
+        TurnOff.exit(self)
 
 
 class TurnOffMonitor(Monitor, object):
@@ -320,14 +893,103 @@ class TurnOffMonitor(Monitor, object):
         ''' Perform cleanup function '''
         self.action()
 
+    def onSettingsChanged(self):  # pylint: disable=invalid-name
+        ''' Reload the settings snapshot, and enumerate the outputs again '''
+        get_settings(refresh=True)
+        if hasattr(display_outputs, 'cached'):
+            del display_outputs.cached
+
+
+class TurnOffService(TurnOffMonitor):
+    ''' A resident service that keeps everything loaded, the screensaver entry point only signals it '''
+
+    def __init__(self):  # pylint: disable=super-init-not-called
+        ''' Initialize service '''
+        TurnOffMonitor.__init__(self, action=self.deactivate)
+        self.prepared = False
+        self.session = None
+
+    def prepare(self):
+        ''' Load everything a screensaver session needs, so activation does not have to '''
+        settings = get_settings()
+        self.prepared = True
+        addon_id()
+        addon_path()
+        duration_stats()
+        capabilities()
+        reconcile_state(restore=True)
+        if settings.prewake:
+            usage_patterns()
+        if DISPLAY_METHODS[settings.display_method].get('name') == 'auto':
+            method_ranking()
+        if settings.command_helper:
+            helper_client()
+        log(2, 'Service is ready to turn off the display')
+
+    @staticmethod
+    def announce():
+        ''' Let the screensaver entry point know whether it can hand off to the service '''
+        from xbmcgui import Window
+        if get_settings().service:
+            Window(10000).setProperty(SERVICE_PROPERTY, 'ready')
+        else:
+            Window(10000).clearProperty(SERVICE_PROPERTY)
+
+    def run(self):
+        ''' Run the service until Kodi exits, it only loads anything when the service setting is enabled '''
+        if get_settings().service:
+            self.prepare()
+        self.announce()
+        LOG_BUFFER.flush()
+        self.waitForAbort()
+        from xbmcgui import Window
+        Window(10000).clearProperty(SERVICE_PROPERTY)
+        if self.prepared:
+            close_handles()
+            duration_stats().save()
+        LOG_BUFFER.flush()
+
+    def onNotification(self, sender, method, data):  # pylint: disable=invalid-name,unused-argument
+        ''' Start a screensaver session when the screensaver entry point signals us '''
+        if sender != addon_id() or method != 'Other.activate':
+            return
+        from threading import Thread
+        thread = Thread(target=self.activate, name='activate')
+        thread.daemon = True
+        thread.start()
+
+    def activate(self):
+        ''' Start a screensaver session '''
+        from xbmc import getCondVisibility
+        if getCondVisibility("Player.HasMedia"):
+            log(1, 'Screensaver not started because player has media.')
+            return
+        self.session = TurnOff(monitor=False)
+        self.session.activate()
+
+    def deactivate(self):
+        ''' End the screensaver session, if we started one '''
+        session, self.session = self.session, None
+        if session is not None:
+            session.resume()
+
+    def onSettingsChanged(self):  # pylint: disable=invalid-name
+        ''' Reload the settings snapshot and announce whether the service should be used '''
+        TurnOffMonitor.onSettingsChanged(self)
+        if get_settings().service and not self.prepared:
+            self.prepare()
+        self.announce()
+
 
 def run():
     ''' Runs the screensaver '''
     from xbmc import getCondVisibility
-
-    # If player has media, avoid running
-    if getCondVisibility("Player.HasMedia"):
-        log(1, 'Screensaver not started because player has media.')
-        return
-
-    TurnOffDialog('gui.xml', addon_path(), 'default').doModal()
+    TRACER.start('activate')
+    with TRACER.span('run'):
+        # If player has media, avoid running
+        if getCondVisibility("Player.HasMedia"):
+            log(1, 'Screensaver not started because player has media.')
+            TRACER.finish('skipped')
+            return
+        dialog = TurnOffDialog('gui.xml', addon_path(), 'default')
+    dialog.doModal()
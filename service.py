@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' This Kodi addon service keeps the Turn Off screensaver loaded, so it can turn off display devices faster '''
+
+from __future__ import absolute_import, division, unicode_literals
+import screensaver
+screensaver.TurnOffService().run()
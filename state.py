@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Keep track of the state we left the display and audio in, so we never send a command whose target state is already reached
+
+Some display methods toggle (e.g. ToggleDPMS), sending them twice leaves the display in the wrong state. Others
+are slow (e.g. CEC), sending them twice costs seconds of bus traffic. The state is stored in the add-on profile,
+so it survives the screensaver script and Kodi restarts.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+from kodiutils import log
+
+# The transitional state a device is in while a command to reach a target state is being sent
+TRANSITIONS = {
+    'on': 'turning-on',
+    'off': 'turning-off',
+    'muted': 'muting',
+    'unmuted': 'unmuting',
+}
+
+# The state of a device nobody touched yet
+INITIAL_STATES = dict(display='on', audio='unmuted')
+
+
+class DeviceState(object):
+    ''' The state of the display and audio, and the display method that turned the display off '''
+
+    def __init__(self, path):
+        ''' Load the state we left the display and audio in '''
+        from json import load
+        from threading import Lock
+        self.path = path
+        self.lock = Lock()
+        try:
+            with open(path) as fdesc:
+                data = dict(load(fdesc))
+        except (IOError, OSError, TypeError, ValueError):  # Also when the file holds anything but an object
+            data = {}
+        self.states = dict((device, data.get(device) or state) for device, state in INITIAL_STATES.items())
+        self.method = data.get('method')
+
+    def get(self, device):
+        ''' Return the state of a device '''
+        return self.states.get(device)
+
+    def stale(self):
+        ''' Return which devices were not left in their initial state, e.g. by a session that never resumed '''
+        return [device for device, state in sorted(INITIAL_STATES.items()) if self.states.get(device) != state]
+
+    def begin(self, device, target):
+        ''' Start a transition, returns whether the command should be sent, or the target state is already (being) reached '''
+        with self.lock:
+            current = self.states.get(device)
+            if current in (target, TRANSITIONS.get(target)):
+                log(2, "Skipping command, the {device} is already {state}", device=device, state=current)
+                return False
+            self.states[device] = TRANSITIONS.get(target)
+            return True
+
+    def end(self, device, target, method=None):
+        ''' Finish a transition, and store the state the device is in now '''
+        with self.lock:
+            self.states[device] = target
+            if method is not None:
+                self.method = method
+            self.save()
+
+    def save(self):
+        ''' Write the state to the add-on profile '''
+        from json import dump
+        with open(self.path, 'w') as fdesc:
+            dump(dict(self.states, method=self.method), fdesc, separators=(',', ':'))
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+''' Benchmark how long the screensaver takes to turn the display off and back on
+
+Every display and power method is run against the Kodi stubs, with latency injected
+into executebuiltin(), executeJSONRPC(), spawned commands, X11 requests, DRM ioctls, DDC/CI requests and D-Bus calls.
+Whatever time is spent on top of the injected latency is overhead of the screensaver itself,
+which is compared to the thresholds below and written out as JSON. It is not part of the unit tests,
+because its thresholds depend on the machine it runs on.
+
+Run it using: make benchmark, or PYTHONPATH=tests python -m tests.benchmark [<results file>]
+'''
+
+# pylint: disable=invalid-name
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from userprofile import forget_profile
+import kodiutils
+import screensaver
+
+xbmc = __import__('xbmc')
+xbmcaddon = __import__('xbmcaddon')
+
+try:  # Python 3
+    from time import monotonic as timer
+except ImportError:  # Python 2
+    from time import time as timer
+
+RESULTS_FILE = os.path.join(tempfile.gettempdir(), 'screensaver.turnoff-benchmark.json')
+
+# Latency (in seconds) injected into every call to Kodi, every spawned command, every X11 request, every DRM ioctl, every DDC/CI request and every D-Bus call
+LATENCY = dict(executebuiltin=0.05, executeJSONRPC=0.02, command=0.1, x11=0.01, ioctl=0.001, ddc=0.05, dbus=0.005)
+
+# The kind of latency every method function is subject to
+FUNCTION_LATENCY = dict(jsonrpc='executeJSONRPC', logind_power_off='dbus', run_builtin='executebuiltin', run_command='command',
+                        set_ddc_power='ddc', set_dpms='x11', set_drm_dpms='ioctl', set_outputs='command')
+
+# What 'xrandr --query' returns
+XRANDR_OUTPUT = 'HDMI-1 connected primary 1920x1080+0+0 (normal left inverted right x axis y axis) 527mm x 296mm\n'
+
+# Maximum overhead (in milliseconds) on top of the injected latency, anything slower is a regression
+THRESHOLDS = dict(off=100, on=100, power=100)
+
+# Number of rounds per method, the median is reported
+ROUNDS = 3
+
+
+class FakeXDisplay(object):
+    ''' An X server connection that takes a fixed time for every request '''
+
+    def __init__(self):
+        ''' Initialize fake display '''
+        self.mode = 'on'
+
+    def force_level(self, mode):
+        ''' Force the display into a DPMS mode '''
+        time.sleep(LATENCY.get('x11'))
+        self.mode = mode
+
+    def power_level(self):
+        ''' Return the current DPMS mode '''
+        time.sleep(LATENCY.get('x11'))
+        return self.mode
+
+    def close(self):
+        ''' Close the connection '''
+
+
+class FakeModeDevice(object):
+    ''' DRM connectors or a DDC/CI monitor that take a fixed time for every request '''
+
+    def __init__(self, kind):
+        ''' Initialize fake device, the kind of latency is a key of LATENCY '''
+        self.current = 'on'
+        self.latency = kind
+
+    def set_mode(self, mode):
+        ''' Set the DPMS or power mode '''
+        time.sleep(LATENCY.get(self.latency))
+        self.current = mode
+
+    def mode(self):
+        ''' Return the current DPMS or power mode '''
+        time.sleep(LATENCY.get(self.latency))
+        return self.current
+
+    def close(self):
+        ''' Close the device '''
+
+
+class FakeLogind(object):
+    ''' A logind connection that takes a fixed time for every call '''
+
+    @staticmethod
+    def power_off(method):  # pylint: disable=unused-argument
+        ''' Call a logind power method '''
+        time.sleep(LATENCY.get('dbus'))
+
+    def close(self):
+        ''' Close the connection '''
+
+
+def spawn_command(command, timeout=None, **kwargs):  # pylint: disable=unused-argument
+    ''' Pretend to run a command that takes a fixed time '''
+    time.sleep(LATENCY.get('command'))
+    output = XRANDR_OUTPUT if list(command) == ['xrandr', '--query'] else ''
+    return dict(rc=0, output=output, duration=int(LATENCY.get('command') * 1000), timeout=False)
+
+
+class Capabilities(object):
+    ''' Every method is usable, the benchmark fakes whatever it needs '''
+
+    @staticmethod
+    def usable(kind, method):  # pylint: disable=unused-argument
+        ''' Return the method is usable '''
+        return True, None
+
+
+class Recorder(object):
+    ''' Record when every display and power function returns '''
+
+    def __init__(self):
+        ''' Initialize recorder '''
+        self.func = screensaver.func
+        self.returned = {}
+
+    def __call__(self, function, *args, **kwargs):
+        ''' Run the function and record when it returned '''
+        try:
+            return self.func(function, *args, **kwargs)
+        finally:
+            self.returned.setdefault((function, args or tuple(sorted(kwargs.items()))), []).append(timer())
+
+    def elapsed(self, start, function, *args, **kwargs):
+        ''' Return the time in milliseconds from start until the function first returned after it '''
+        returned = [end for end in self.returned.get((function, args or tuple(sorted(kwargs.items()))), []) if end >= start]
+        return (returned[0] - start) * 1000 if returned else None
+
+
+def fake_sysfs(method, directory):
+    ''' Return a copy of a kernel display method that writes to a file in our directory instead '''
+    if method.get('function') != 'write_sysfs':
+        return method
+    path = os.path.join(directory, method.get('name'))
+    with open(path, 'w') as fd:
+        fd.write(method.get('args_on')[1] + '\n')
+    return dict(method,
+                args_off=[path] + method.get('args_off')[1:],
+                args_on=[path] + method.get('args_on')[1:],
+                args_state=[path] + method.get('args_state')[1:])
+
+
+def median(values):
+    ''' Return the median of a list of values '''
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def latency(method):
+    ''' Return the latency (in milliseconds) injected into a display or power method '''
+    return LATENCY.get(FUNCTION_LATENCY.get(method.get('function')), 0) * 1000
+
+
+def cycle(display, power):
+    ''' Activate and deactivate the screensaver once, and return how long the display and power actions took '''
+    recorder = Recorder()
+    dialogs = []
+
+    class TurnOffDialog(screensaver.TurnOffDialog):  # pylint: disable=too-many-ancestors
+        ''' Keep track of the dialog run() creates '''
+
+        def onInit(self):
+            ''' Perform this when the screensaver is started '''
+            dialogs.append(self)
+            super(TurnOffDialog, self).onInit()
+
+    dialog_class, screensaver.TurnOffDialog = screensaver.TurnOffDialog, TurnOffDialog
+    screensaver.func = recorder
+    screensaver.x_display.cached = FakeXDisplay()
+    screensaver.ddc_monitor.cached = FakeModeDevice('ddc')
+    screensaver.drm_dpms.cached = FakeModeDevice('ioctl')
+    screensaver.logind.cached = FakeLogind()
+    try:
+        start = timer()
+        screensaver.run()  # The stub doModal() calls onInit()
+        wake = timer()
+        dialogs[0].monitor.onScreensaverDeactivated()
+    finally:
+        screensaver.func = recorder.func
+        screensaver.TurnOffDialog = dialog_class
+    return dict(
+        off=recorder.elapsed(start, display.get('function'), *display.get('args_off')),
+        power=recorder.elapsed(start, power.get('function'), **power.get('kwargs_off', {})),
+        on=recorder.elapsed(wake, display.get('function'), *display.get('args_on')),
+    )
+
+
+def benchmark(display_method, power_method):
+    ''' Run a number of screensaver cycles and return the median durations and overhead of every phase '''
+    display = screensaver.DISPLAY_METHODS[display_method]
+    power = screensaver.POWER_METHODS[power_method]
+    xbmcaddon.Addon().settings.update(display_method=str(display_method), power_method=str(power_method))
+    screensaver.get_settings(refresh=True)
+    samples = [cycle(display, power) for _ in range(ROUNDS)]
+
+    # Audio is muted in parallel to turning off the display, powering off waits for both
+    expected = dict(
+        off=latency(display),
+        on=latency(display),
+        power=max(latency(display), LATENCY.get('executeJSONRPC') * 1000) + latency(power),
+    )
+    result = {}
+    for phase, threshold in THRESHOLDS.items():
+        duration = median(sample.get(phase) for sample in samples)
+        overhead = duration - expected.get(phase)
+        result[phase] = dict(duration=round(duration, 2), expected=expected.get(phase), overhead=round(overhead, 2),
+                             threshold=threshold, regression=overhead > threshold)
+    return result
+
+
+def run():
+    ''' Benchmark every display method and every power method, and return the results '''
+    settings = dict(xbmcaddon.Addon().settings)
+    xbmcaddon.Addon().settings.update(confirm_display_off='false', logoff='false', mute='true', resume_mode='0', command_helper='false')
+    xbmc.LATENCY.update(executebuiltin=LATENCY.get('executebuiltin'), executeJSONRPC=LATENCY.get('executeJSONRPC'))
+    sysfs = tempfile.mkdtemp()
+    profile = tempfile.mkdtemp()  # Do not mix the injected durations with those of real sessions
+    forget_profile()
+    kodiutils.addon_profile.cached = profile
+    display_methods = list(screensaver.DISPLAY_METHODS)
+    spawn, screensaver.spawn_command = screensaver.spawn_command, spawn_command
+    power_off_delay, screensaver.POWER_OFF_DELAY = screensaver.POWER_OFF_DELAY, 0  # We do not measure deliberate waits
+    screensaver.DISPLAY_METHODS[:] = [fake_sysfs(method, sysfs) for method in display_methods]
+    screensaver.capabilities.cached = Capabilities()
+    try:
+        results = dict(
+            latency=LATENCY,
+            display_methods=dict((method.get('name'), benchmark(index, 0)) for index, method in enumerate(display_methods) if method.get('name') != 'auto'),
+            power_methods=dict((method.get('name'), benchmark(0, index)) for index, method in enumerate(screensaver.POWER_METHODS)),
+        )
+    finally:
+        screensaver.close_handles()
+        screensaver.DISPLAY_METHODS[:] = display_methods
+        screensaver.POWER_OFF_DELAY = power_off_delay
+        screensaver.spawn_command = spawn
+        xbmc.LATENCY.update(executebuiltin=0, executeJSONRPC=0)
+        xbmcaddon.Addon().settings.clear()
+        xbmcaddon.Addon().settings.update(settings)
+        screensaver.get_settings(refresh=True)
+        forget_profile()
+        shutil.rmtree(profile)
+        shutil.rmtree(sysfs)
+    results['regressions'] = sorted('%s/%s' % (name, phase)
+                                    for methods in (results.get('display_methods'), results.get('power_methods'))
+                                    for name, phases in methods.items()
+                                    for phase, result in phases.items() if result.get('regression'))
+    return results
+
+
+def save(results, path=RESULTS_FILE):
+    ''' Write the results as JSON '''
+    with open(path, 'w') as fd:
+        json.dump(results, fd, sort_keys=True, indent=4)
+
+
+if __name__ == '__main__':
+    benchmark_results = run()
+    save(benchmark_results, *sys.argv[1:2])
+    print('Results written to %s' % (sys.argv[1:2] or [RESULTS_FILE])[0])
+    for regression in benchmark_results.get('regressions'):
+        print('Regression: %s' % regression)
+    sys.exit(1 if benchmark_results.get('regressions') else 0)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import errno
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import ddc
+
+
+class FakeI2cBus(object):
+    ''' An i2c-dev device with a monitor that answers DDC/CI requests from memory '''
+
+    buses = {}  # Path: power mode of the monitor on it, or None for a bus without a monitor
+    edids = set()  # Paths of the buses with a monitor EDID
+    requested = []  # Paths of the buses DDC/CI requests were written to
+
+    def __init__(self, path, address=ddc.DDC_ADDRESS):
+        if path not in self.buses or address not in (ddc.DDC_ADDRESS, ddc.EDID_ADDRESS):
+            raise IOError(errno.ENXIO, 'No such device or address')
+        self.address = address
+        self.path = path
+        self.reply = b''
+        self.written = []
+
+    def write(self, data):
+        data = bytearray(data)
+        if self.address == ddc.EDID_ADDRESS:
+            if self.path not in self.edids:
+                raise IOError(errno.EREMOTEIO, 'Remote I/O error')
+            self.reply = ddc.EDID_HEADER + b'\x10\xac'
+            return
+        self.requested.append(self.path)
+        if self.buses.get(self.path) is None:
+            raise IOError(errno.EREMOTEIO, 'Remote I/O error')
+        assert data[0] == ddc.DDC_HOST and data[1] == 0x80 | (len(data) - 3)
+        assert ddc.checksum(data[:-1]) == data[-1], 'Invalid checksum'
+        self.written.append(bytes(data))
+        if data[2] == ddc.DDC_SET_VCP and data[3] == ddc.VCP_POWER_MODE:
+            self.buses[self.path] = data[4] << 8 | data[5]
+        elif data[2] == ddc.DDC_GET_VCP:
+            supported = 0 if data[3] == ddc.VCP_POWER_MODE else 1
+            value = self.buses.get(self.path)
+            reply = bytearray([ddc.DDC_DESTINATION, 0x88, ddc.DDC_GET_VCP_REPLY, supported, data[3], 0, 0, 5, value >> 8, value & 0xFF])
+            reply.append(ddc.checksum(reply, ddc.DDC_REPLY_HOST))
+            self.reply = bytes(reply)
+
+    def read(self, length):
+        return self.reply[:length]
+
+    def close(self):
+        pass
+
+
+class TestDdc(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = tempfile.mkdtemp()
+        self.cache = os.path.join(self.profile, 'ddc.json')
+        FakeI2cBus.buses = {'/dev/i2c-0': None, '/dev/i2c-3': 1}
+        self.sleep = []
+
+    def tearDown(self):
+        shutil.rmtree(self.profile)
+
+    def monitor(self):
+        ''' Return the monitor found on the fake buses, without waiting for it '''
+        monitor = ddc.find_monitor(self.cache, pattern=os.path.join(self.profile, 'i2c-*'), bus_class=FakeI2cBus)
+        monitor.sleep = self.sleep.append
+        return monitor
+
+    def test_encode(self):
+        ''' The messages match the ones in the DDC/CI specification '''
+        self.assertEqual(ddc.encode([ddc.DDC_GET_VCP, 0x10]), b'\x51\x82\x01\x10\xac')
+        self.assertEqual(ddc.encode([ddc.DDC_SET_VCP, ddc.VCP_POWER_MODE, 0x00, 0x04]), b'\x51\x84\x03\xd6\x00\x04\x6a')
+
+    def test_decode_vcp_reply(self):
+        reply = bytearray(b'\x6e\x88\x02\x00\xd6\x00\x00\x05\x00\x04')
+        reply.append(ddc.checksum(reply, ddc.DDC_REPLY_HOST))
+        self.assertEqual(ddc.decode_vcp_reply(reply, ddc.VCP_POWER_MODE), 4)
+        reply[9] = 1
+        self.assertRaises(IOError, ddc.decode_vcp_reply, reply, ddc.VCP_POWER_MODE)  # Checksum no longer matches
+        self.assertRaises(IOError, ddc.decode_vcp_reply, reply[:5], ddc.VCP_POWER_MODE)
+
+    def test_power_mode(self):
+        monitor = ddc.DdcMonitor(FakeI2cBus('/dev/i2c-3'))
+        monitor.sleep = self.sleep.append
+        self.assertEqual(monitor.mode(), 'on')
+        monitor.set_mode('off')
+        self.assertEqual(FakeI2cBus.buses.get('/dev/i2c-3'), 4)
+        self.assertEqual(monitor.mode(), 'off')
+        self.assertEqual(self.sleep, [ddc.DDC_REPLY_DELAY, ddc.DDC_WRITE_DELAY, ddc.DDC_REPLY_DELAY])
+
+    def test_find_monitor(self):
+        ''' The bus with the monitor is found once and cached in the profile '''
+        for bus in ('i2c-0', 'i2c-3', 'i2c-7'):
+            open(os.path.join(self.profile, bus), 'w').close()
+        FakeI2cBus.buses = dict((os.path.join(self.profile, bus), mode) for bus, mode in (('i2c-0', None), ('i2c-3', 1), ('i2c-7', None)))
+        FakeI2cBus.edids = set(os.path.join(self.profile, bus) for bus in ('i2c-3', 'i2c-7'))
+        FakeI2cBus.requested = []
+        monitor = self.monitor()
+        self.assertEqual(monitor.bus.path, os.path.join(self.profile, 'i2c-3'))
+        self.assertNotIn(os.path.join(self.profile, 'i2c-0'), FakeI2cBus.requested)  # No EDID, e.g. a sensor bus
+        with open(self.cache) as fdesc:
+            self.assertEqual(json.load(fdesc), dict(path=os.path.join(self.profile, 'i2c-3'), address=ddc.DDC_ADDRESS))
+
+        # The cached bus is used without scanning or asking the monitor
+        monitor = self.monitor()
+        self.assertEqual(monitor.bus.path, os.path.join(self.profile, 'i2c-3'))
+        self.assertEqual(monitor.bus.written, [])
+
+        # A forgotten bus is scanned for again
+        ddc.forget_monitor(self.cache)
+        del FakeI2cBus.buses[os.path.join(self.profile, 'i2c-3')]
+        self.assertRaises(OSError, self.monitor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import errno
+import unittest
+from ctypes import c_uint32, c_uint64
+import drm
+
+# Connector id: (connected, {property id: value})
+CONNECTORS = {
+    31: (True, {1: 0, 2: 3}),
+    32: (False, {1: 0, 2: 4}),
+    33: (True, {1: 0, 5: 7}),
+}
+PROPERTIES = {1: b'DPMS', 2: b'EDID', 5: b'link-status'}
+
+
+class FakeKmsDevice(drm.KmsDevice):
+    ''' A DRM device that answers the mode-setting ioctls from memory '''
+
+    def __init__(self, master=True):  # pylint: disable=super-init-not-called
+        self.connectors_ = dict((connector_id, (connected, dict(props))) for connector_id, (connected, props) in CONNECTORS.items())
+        self.fd = -1
+        self.master = master
+        self.requests = []
+
+    def ioctl(self, request, struct):
+        self.requests.append(request)
+        if request == drm.DRM_IOCTL_MODE_GETRESOURCES:
+            ids = sorted(self.connectors_)
+            if struct.count_connectors >= len(ids):
+                (c_uint32 * len(ids)).from_address(struct.connector_id_ptr)[:] = ids
+            struct.count_connectors = len(ids)
+        elif request == drm.DRM_IOCTL_MODE_GETCONNECTOR:
+            assert struct.count_modes > 0, 'Probing the connector is slow'
+            struct.connection = 1 if self.connectors_[struct.connector_id][0] else 2
+        elif request == drm.DRM_IOCTL_MODE_OBJ_GETPROPERTIES:
+            assert struct.obj_type == drm.DRM_MODE_OBJECT_CONNECTOR
+            props = sorted(self.connectors_[struct.obj_id][1].items())
+            if struct.count_props >= len(props):
+                (c_uint32 * len(props)).from_address(struct.props_ptr)[:] = [prop_id for prop_id, _ in props]
+                (c_uint64 * len(props)).from_address(struct.prop_values_ptr)[:] = [value for _, value in props]
+            struct.count_props = len(props)
+        elif request == drm.DRM_IOCTL_MODE_GETPROPERTY:
+            struct.name = PROPERTIES[struct.prop_id]
+        elif request == drm.DRM_IOCTL_MODE_OBJ_SETPROPERTY:
+            if not self.master:
+                raise IOError(errno.EACCES, 'Permission denied')
+            self.connectors_[struct.obj_id][1][struct.prop_id] = struct.value
+        else:
+            raise IOError(errno.EINVAL, 'Invalid argument')
+
+    def close(self):
+        self.fd = None
+
+
+class TestDrm(unittest.TestCase):
+
+    def test_ioctl_requests(self):
+        ''' The request numbers match the ones in the kernel headers '''
+        self.assertEqual(drm.DRM_IOCTL_MODE_GETRESOURCES, 0xC04064A0)
+        self.assertEqual(drm.DRM_IOCTL_MODE_GETCONNECTOR, 0xC05064A7)
+        self.assertEqual(drm.DRM_IOCTL_MODE_GETPROPERTY, 0xC04064AA)
+        self.assertEqual(drm.DRM_IOCTL_MODE_OBJ_GETPROPERTIES, 0xC02064B9)
+        self.assertEqual(drm.DRM_IOCTL_MODE_OBJ_SETPROPERTY, 0xC01864BA)
+
+    def test_kms_device(self):
+        device = FakeKmsDevice()
+        self.assertEqual(device.connectors(), [31, 32, 33])
+        self.assertTrue(device.connected(31))
+        self.assertFalse(device.connected(32))
+        self.assertEqual(device.properties(33), {1: 0, 5: 7})
+        self.assertEqual(device.property_name(5), 'link-status')
+        device.set_property(31, 1, 3)
+        self.assertEqual(device.properties(31), {1: 3, 2: 3})
+
+    def test_set_mode(self):
+        device = FakeKmsDevice()
+        dpms = drm.DrmDpms(device)
+        self.assertEqual(dpms.mode(), 'on')
+        dpms.set_mode('off')
+        self.assertEqual(dpms.mode(), 'off')
+        self.assertEqual(device.properties(32), {1: 0, 2: 4})  # Disconnected connectors are left alone
+        dpms.set_mode('on')
+        self.assertEqual(dpms.mode(), 'on')
+
+    def test_connectors_cached(self):
+        ''' The connectors are only enumerated once per session '''
+        device = FakeKmsDevice()
+        dpms = drm.DrmDpms(device)
+        self.assertEqual(dpms.connectors(), {31: 1, 33: 1})
+        del device.requests[:]
+        dpms.set_mode('off')
+        dpms.set_mode('on')
+        self.assertEqual(device.requests, [drm.DRM_IOCTL_MODE_OBJ_SETPROPERTY] * 4)
+
+    def test_not_master(self):
+        ''' Setting properties fails without DRM master, reading them back still works '''
+        dpms = drm.DrmDpms(FakeKmsDevice(master=False))
+        self.assertRaises(IOError, dpms.set_mode, 'off')
+        self.assertEqual(dpms.mode(), 'on')
+
+    def test_open_kms_device(self):
+        self.assertRaises(OSError, drm.open_kms_device, '/nonexistent/card*')
+
+
+if __name__ == '__main__':
+    unittest.main()
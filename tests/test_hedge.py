@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import sys
+import time
+import unittest
+from hedge import Hedge
+
+
+def attempt(duration, success=True):
+    ''' Return an attempt that takes a while to succeed or fail '''
+    return lambda: time.sleep(duration) or success
+
+
+class TestHedge(unittest.TestCase):
+
+    def test_stalled(self):
+        ''' Test the next attempt starts once the budget is spent '''
+        hedge = Hedge(budget=0.2)
+        start = time.time()
+        self.assertEqual(hedge.run([('stalled', attempt(5)), ('fallback', attempt(0.1))]), 'fallback')
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(hedge.started, ['stalled', 'fallback'])
+
+    def test_failed(self):
+        ''' Test the next attempt starts as soon as an attempt fails '''
+        hedge = Hedge(budget=5)
+        start = time.time()
+        self.assertEqual(hedge.run([('failed', lambda: sys.exit(2)), ('fallback', attempt(0.1))]), 'fallback')
+        self.assertLess(time.time() - start, 1)
+        self.assertIsNone(Hedge(budget=5).run([('failed', attempt(0, success=False)), ('fallback', attempt(0, success=False))]))
+
+    def test_preferred(self):
+        ''' Test the next attempt does not start when the first one succeeds in time '''
+        hedge = Hedge(budget=1)
+        self.assertEqual(hedge.run([('preferred', attempt(0.1)), ('fallback', attempt(0))]), 'preferred')
+        self.assertEqual(hedge.started, ['preferred'])
+
+    def test_unconfirmed(self):
+        ''' Test an attempt that cannot tell whether it succeeded gets the whole budget, and only wins without a success '''
+        hedge = Hedge(budget=0.3)
+        start = time.time()
+        self.assertEqual(hedge.run([('unconfirmed', attempt(0, success=None)), ('fallback', attempt(0, success=None))]), 'unconfirmed')
+        self.assertGreaterEqual(time.time() - start, 0.3)
+        self.assertEqual(hedge.started, ['unconfirmed', 'fallback'])
+        self.assertEqual(Hedge(budget=0.1).run([('unconfirmed', attempt(0, success=None)), ('fallback', attempt(0))]), 'fallback')
+
+    def test_race(self):
+        ''' Test all attempts start at once and the first success wins '''
+        hedge = Hedge(budget=5, race=True)
+        self.assertEqual(hedge.run([('slow', attempt(0.5)), ('fast', attempt(0.1))]), 'fast')
+        self.assertEqual(hedge.started, ['slow', 'fast'])
+
+
+if __name__ == '__main__':
+    unittest.main()
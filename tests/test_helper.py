@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import helper
+import screensaver
+
+xbmcaddon = __import__('xbmcaddon')
+
+addon = xbmcaddon.Addon()
+
+
+class TestHelper(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'helper.sock')
+        self.helper = helper.Helper(self.path, [['true'], ['false'], ['echo', 'display_power=0'], ['sleep', '5']])
+        self.helper.bind()
+        self.thread = threading.Thread(target=self.helper.serve)
+        self.thread.start()
+        self.client = helper.HelperClient(self.path)
+
+    def tearDown(self):
+        self.client.close()
+        quitter = helper.HelperClient(self.path)
+        quitter.sock.sendall(b'{"quit": true}\n')
+        quitter.close()
+        self.thread.join(5)
+        shutil.rmtree(self.tempdir)
+
+    def test_helper_protocol(self):
+        ''' Test the helper only runs allowed commands '''
+        response = self.client.run(['echo', 'display_power=0'])
+        self.assertEqual((response.get('rc'), response.get('output')), (0, 'display_power=0\n'))
+        self.assertEqual(self.client.run(['false']).get('rc'), 1)
+        self.assertIn('error', self.client.run(['echo', 'display_power=1']))
+        self.assertEqual(oct(os.stat(self.path).st_mode & 0o777), oct(0o600))
+
+    def test_helper_threads(self):
+        ''' Test commands sent from several threads each get their own response '''
+        responses = []
+
+        def run(command):
+            responses.append((command[0], self.client.run(command).get('rc')))
+
+        threads = [threading.Thread(target=run, args=(command,)) for command in (['true'], ['false']) * 5]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sorted(responses), [('false', 1)] * 5 + [('true', 0)] * 5)
+
+    def test_helper_timeout(self):
+        ''' Test the helper kills commands that overrun their budget '''
+        response = self.client.run(['sleep', '5'], timeout=0.5)
+        self.assertTrue(response.get('timeout'))
+        self.assertLess(response.get('duration'), 2000)
+
+    def test_run_command_using_helper(self):
+        ''' Test run_command() dispatches to the helper '''
+        addon.settings['command_helper'] = 'true'
+        screensaver.TurnOffMonitor().onSettingsChanged()
+        screensaver.helper_client.cached = self.client
+        helper_commands = screensaver.helper_commands
+        screensaver.helper_commands = lambda: [['true'], ['false'], ['echo', 'display_power=1']]
+        try:
+            screensaver.run_command('true')
+            with self.assertRaises(screensaver.ActionError):
+                screensaver.run_command('false')
+            with self.assertRaises(screensaver.ActionError):
+                screensaver.run_command('echo', 'display_power=1')
+            screensaver.run_command('echo', 'xrandr')  # Not meant for the helper
+        finally:
+            screensaver.helper_commands = helper_commands
+            del screensaver.helper_client.cached
+            addon.settings['command_helper'] = 'false'
+            screensaver.TurnOffMonitor().onSettingsChanged()
+
+    def test_helper_retry(self):
+        ''' Test connecting to the helper is retried after a backoff, instead of giving up for good '''
+        attempts = []
+        connect_helper, screensaver.connect_helper = screensaver.connect_helper, lambda: attempts.append(True)
+        try:
+            self.assertIsNone(screensaver.helper_client())
+            self.assertIsNone(screensaver.helper_client())
+            self.assertEqual(len(attempts), 1)
+            self.assertEqual(screensaver.helper_client.retry[1], 2 * screensaver.HELPER_RETRY_DELAY)
+            screensaver.helper_client.retry = (0, screensaver.helper_client.retry[1])
+            screensaver.connect_helper = lambda: self.client
+            self.assertIs(screensaver.helper_client(), self.client)
+        finally:
+            screensaver.connect_helper = connect_helper
+            del screensaver.helper_client.retry
+            del screensaver.helper_client.cached
+
+    def test_helper_interpreter(self):
+        executable = screensaver.sys.executable
+        try:
+            self.assertEqual(screensaver.helper_interpreter(), executable)
+            screensaver.sys.executable = '/usr/lib/kodi/kodi.bin'
+            self.assertIsNone(screensaver.helper_interpreter())
+        finally:
+            screensaver.sys.executable = executable
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import unittest
+from userprofile import ProfileTestCase
+import kodiutils
+
+xbmcaddon = __import__('xbmcaddon')
+
+addon = xbmcaddon.Addon()
+
+
+class TestKodiUtils(ProfileTestCase):
+
+    def test_settings_snapshot(self):
+        ''' Test the settings snapshot is only refreshed on settings changes '''
+        addon.settings['display_method'] = '3'
+        addon.settings['mute'] = 'false'
+        kodiutils.get_settings(refresh=True)
+        settings = kodiutils.get_settings()
+        self.assertEqual(settings.display_method, 3)
+        self.assertFalse(settings.mute)
+        addon.settings['display_method'] = '4'
+        self.assertEqual(kodiutils.get_settings().display_method, 3)
+        kodiutils.get_settings(refresh=True)
+        self.assertEqual(kodiutils.get_settings().display_method, 4)
+        addon.settings['mute'] = 'true'
+        kodiutils.get_settings(refresh=True)
+
+    def test_log_buffer(self):
+        ''' Test buffered logging and template rendering '''
+        buf = kodiutils.LogBuffer(size=3)
+        self.assertEqual(buf.render("Running '{command}' returned rc={rc}", dict(rc=0)), "Running '{command}' returned rc=0")
+        self.assertEqual(buf.render('{value!r:>6}', dict(value='a')), '{0:>6}'.format(repr('a')))
+        self.assertIs(buf.compile('{foo}'), buf.compile('{foo}'))
+        buf.append(2, 'First {name}', dict(name='record'))
+        buf.append(2, 'Second record', {})
+        self.assertEqual(len(buf.records), 2)
+        buf.append(2, 'Third record', {})
+        self.assertEqual(len(buf.records), 0)
+        steps = [0]
+        buf.append(2, 'Steps: {steps}, took {duration:.1f}ms', dict(steps=steps, duration=1.5))
+        steps.append(5)  # Logged as it was when appended
+        self.assertEqual(buf.render(*buf.records[0][1:]), 'Steps: [0], took 1.5ms')
+
+    def test_jsonrpc_batch(self):
+        ''' Test batched JSON-RPC calls are mapped back to their caller '''
+        values = []
+        batch = kodiutils.JsonRpcBatch()
+        batch.add('Settings.GetSettingValue', dict(setting='debug.showloginfo'), callback=values.append)
+        mute_id = batch.add('Application.SetMute', dict(mute=True))
+        responses = batch.send()
+        self.assertEqual(values[0].get('result'), dict(value=True))
+        self.assertEqual(responses.get(mute_id).get('result'), 'OK')
+        self.assertEqual(batch.send(), {})
+        self.assertIs(kodiutils.jsonrpc_payload('Application.SetMute', dict(mute=True)),
+                      kodiutils.jsonrpc_payload('Application.SetMute', dict(mute=True)))
+        self.assertEqual(kodiutils.jsonrpc('Settings.GetSettingValue', dict(setting='locale.language')).get('result'),
+                         dict(value='resource.language.en_gb'))
+
+    def test_tracer(self):
+        ''' Test spans are only recorded when tracing is enabled, and the trace file is rotated '''
+        import json
+        import os
+        tracer = kodiutils.Tracer()
+        addon.settings['trace'] = 'false'
+        kodiutils.get_settings(refresh=True)
+        tracer.start('activate')
+        self.assertIs(tracer.span('run'), kodiutils.NO_SPAN)
+        addon.settings['trace'] = 'true'
+        kodiutils.get_settings(refresh=True)
+        path = os.path.join(kodiutils.addon_profile(), 'trace.jsonl')
+        with open(path, 'w') as fdesc:
+            fdesc.write(' ' * (kodiutils.TRACE_FILE_SIZE + 1))
+        tracer.start('activate', display='do-nothing')
+        with tracer.span('run_builtin', 'CECStandby'):
+            pass
+        tracer.start('wake')
+        tracer.finish('ok')
+        with open(path + '.1') as fdesc:
+            self.assertEqual(len(fdesc.read()), kodiutils.TRACE_FILE_SIZE + 1)
+        with open(path) as fdesc:
+            records = [json.loads(line) for line in fdesc]
+        self.assertEqual([(record.get('cycle'), record.get('outcome')) for record in records], [('activate', 'interrupted'), ('wake', 'ok')])
+        self.assertEqual(records[0].get('display'), 'do-nothing')
+        self.assertEqual([(phase.get('name'), phase.get('detail')) for phase in records[0].get('phases')], [('run_builtin', 'CECStandby')])
+        addon.settings['trace'] = 'false'
+        kodiutils.get_settings(refresh=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
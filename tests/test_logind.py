@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import unittest
+from ctypes import POINTER, byref, c_char_p, c_int, c_uint32, c_void_p
+from ctypes.util import find_library
+import logind
+
+try:  # Python 3
+    from shutil import which
+except ImportError:  # Python 2
+    from distutils.spawn import find_executable as which  # pylint: disable=deprecated-module
+
+BUS_CONFIG = '''<!DOCTYPE busconfig PUBLIC "-//freedesktop//DTD D-Bus Bus Configuration 1.0//EN"
+ "http://www.freedesktop.org/standards/dbus/1.0/busconfig.dtd">
+<busconfig>
+  <type>session</type>
+  <listen>unix:path=%s</listen>
+  <auth>EXTERNAL</auth>
+  <policy context="default">
+    <allow send_destination="*"/>
+    <allow receive_sender="*"/>
+    <allow own="*"/>
+  </policy>
+</busconfig>
+'''
+
+DBUS_MESSAGE_TYPE_METHOD_CALL = 1
+
+
+class StubLogind(logind.DBusConnection):
+    ''' A login1 object on the bus that records the power methods it was asked to call '''
+
+    def __init__(self, address, fail=None):
+        logind.DBusConnection.__init__(self, address)
+        self.calls = []
+        self.fail = fail
+        self.stopped = threading.Event()
+        self.dbus.dbus_bus_request_name.argtypes = [c_void_p, c_char_p, c_uint32, POINTER(logind.DBusError)]
+        self.dbus.dbus_connection_flush.argtypes = [c_void_p]
+        self.dbus.dbus_connection_pop_message.argtypes = [c_void_p]
+        self.dbus.dbus_connection_pop_message.restype = c_void_p
+        self.dbus.dbus_connection_read_write.argtypes = [c_void_p, c_int]
+        self.dbus.dbus_connection_send.argtypes = [c_void_p, c_void_p, c_void_p]
+        self.dbus.dbus_message_get_member.argtypes = [c_void_p]
+        self.dbus.dbus_message_get_member.restype = c_char_p
+        self.dbus.dbus_message_get_type.argtypes = [c_void_p]
+        self.dbus.dbus_message_iter_get_basic.argtypes = [POINTER(logind.DBusMessageIter), c_void_p]
+        self.dbus.dbus_message_iter_init.argtypes = [c_void_p, POINTER(logind.DBusMessageIter)]
+        self.dbus.dbus_message_new_error.argtypes = [c_void_p, c_char_p, c_char_p]
+        self.dbus.dbus_message_new_error.restype = c_void_p
+        self.dbus.dbus_message_new_method_return.argtypes = [c_void_p]
+        self.dbus.dbus_message_new_method_return.restype = c_void_p
+        error = self.error()
+        self.dbus.dbus_bus_request_name(self.connection, logind.LOGIND_NAME.encode('utf-8'), 0, byref(error))
+        self.check(error)
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.start()
+
+    def serve(self):
+        while not self.stopped.is_set():
+            self.dbus.dbus_connection_read_write(self.connection, 50)
+            message = self.dbus.dbus_connection_pop_message(self.connection)
+            if not message:
+                continue
+            if self.dbus.dbus_message_get_type(message) == DBUS_MESSAGE_TYPE_METHOD_CALL:
+                arguments, interactive = logind.DBusMessageIter(), c_uint32()
+                if self.dbus.dbus_message_iter_init(message, byref(arguments)):
+                    self.dbus.dbus_message_iter_get_basic(byref(arguments), byref(interactive))
+                member = self.dbus.dbus_message_get_member(message).decode('utf-8')
+                self.calls.append((member, bool(interactive.value)))
+                if member == self.fail:
+                    reply = self.dbus.dbus_message_new_error(message, b'org.freedesktop.login1.OperationInProgress', b'Operation in progress')
+                else:
+                    reply = self.dbus.dbus_message_new_method_return(message)
+                self.dbus.dbus_connection_send(self.connection, reply, None)
+                self.dbus.dbus_connection_flush(self.connection)
+                self.dbus.dbus_message_unref(reply)
+            self.dbus.dbus_message_unref(message)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.close()
+
+
+@unittest.skipIf(which('dbus-daemon') is None or find_library('dbus-1') is None, 'Requires dbus-daemon and libdbus')
+class TestLogind(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = os.path.join(self.directory, 'bus.conf')
+        with open(config, 'w') as fdesc:
+            fdesc.write(BUS_CONFIG % os.path.join(self.directory, 'bus'))
+        with open(os.devnull, 'wb') as devnull:
+            self.daemon = subprocess.Popen(['dbus-daemon', '--config-file=%s' % config, '--nofork', '--print-address'],
+                                           stdout=subprocess.PIPE, stderr=devnull)
+        self.address = self.daemon.stdout.readline().decode('utf-8').strip()
+
+    def tearDown(self):
+        self.daemon.terminate()
+        self.daemon.wait()
+        self.daemon.stdout.close()
+        shutil.rmtree(self.directory)
+
+    def test_power_off(self):
+        ''' Every power method is called on the same connection, without asking interactively '''
+        stub = StubLogind(self.address)
+        manager = logind.Logind(logind.DBusConnection(self.address))
+        try:
+            connection = manager.connection.connection
+            for method in ('Suspend', 'Hibernate', 'PowerOff'):
+                manager.power_off(method)
+            self.assertEqual(manager.connection.connection, connection)
+        finally:
+            manager.close()
+            stub.stop()
+        self.assertEqual(stub.calls, [('Suspend', False), ('Hibernate', False), ('PowerOff', False)])
+
+    def test_error(self):
+        ''' Errors returned by logind are raised '''
+        stub = StubLogind(self.address, fail='Suspend')
+        manager = logind.Logind(logind.DBusConnection(self.address))
+        try:
+            with self.assertRaises(OSError) as context:
+                manager.power_off('Suspend')
+            self.assertIn('org.freedesktop.login1.OperationInProgress', str(context.exception))
+        finally:
+            manager.close()
+            stub.stop()
+
+    def test_no_logind(self):
+        ''' Calling logind when it is not on the bus fails right away '''
+        manager = logind.Logind(logind.DBusConnection(self.address))
+        try:
+            self.assertRaises(OSError, manager.power_off, 'Suspend')
+        finally:
+            manager.close()
+
+    def test_no_bus(self):
+        self.assertRaises(OSError, logind.DBusConnection, 'unix:path=%s' % os.path.join(self.directory, 'nobus'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+import outputs
+
+XRANDR_QUERY = '''Screen 0: minimum 320 x 200, current 3840 x 1080, maximum 16384 x 16384
+eDP-1 connected primary 1920x1080+0+0 (normal left inverted right x axis y axis) 309mm x 174mm
+   1920x1080     60.02*+  60.01    59.97    59.96    59.93
+DP-1 disconnected (normal left inverted right x axis y axis)
+HDMI-1 connected 1920x1080+1920+0 (normal left inverted right x axis y axis) 527mm x 296mm
+   1920x1080     60.00*+  50.00    59.94
+HDMI-2 connected (normal left inverted right x axis y axis)
+   1920x1080     60.00 +
+'''
+
+
+class TestOutputs(unittest.TestCase):
+
+    def setUp(self):
+        self.drm = tempfile.mkdtemp()
+        for connector, status in (('card0-eDP-1', 'connected'), ('card0-HDMI-A-1', 'connected'), ('card0-DP-1', 'disconnected')):
+            self.plug(connector, status)
+        os.mkdir(os.path.join(self.drm, 'card0'))
+
+    def tearDown(self):
+        shutil.rmtree(self.drm)
+
+    def plug(self, connector, status):
+        ''' Change the status of a fake DRM connector '''
+        if not os.path.isdir(os.path.join(self.drm, connector)):
+            os.mkdir(os.path.join(self.drm, connector))
+        with open(os.path.join(self.drm, connector, 'status'), 'w') as fdesc:
+            fdesc.write(status + '\n')
+
+    def test_parse_xrandr(self):
+        ''' Test the connected outputs and their layout are parsed '''
+        parsed = outputs.parse_xrandr(XRANDR_QUERY)
+        self.assertEqual([output.get('name') for output in parsed], ['eDP-1', 'DP-1', 'HDMI-1', 'HDMI-2'])
+        self.assertEqual(parsed[0], dict(name='eDP-1', connected=True, primary=True, mode='1920x1080', position='0x0'))
+        self.assertFalse(parsed[1].get('connected'))
+        self.assertEqual(parsed[2].get('position'), '1920x0')
+        self.assertIsNone(parsed[3].get('mode'))
+
+    def test_drm_connectors(self):
+        ''' Test the status of DRM connectors is read '''
+        self.assertEqual(outputs.drm_connectors(self.drm), {'card0-eDP-1': 'connected', 'card0-HDMI-A-1': 'connected', 'card0-DP-1': 'disconnected'})
+        self.assertEqual(outputs.drm_connectors(os.path.join(self.drm, 'missing')), {})
+
+    def test_xrandr_command(self):
+        ''' Test all outputs are switched using a single command, restoring their layout '''
+        connected = [output for output in outputs.parse_xrandr(XRANDR_QUERY) if output.get('connected')]
+        self.assertEqual(outputs.xrandr_command(connected, 'off'),
+                         ['xrandr', '--output', 'eDP-1', '--off', '--output', 'HDMI-1', '--off', '--output', 'HDMI-2', '--off'])
+        self.assertEqual(outputs.xrandr_command(connected, 'on'),
+                         ['xrandr', '--output', 'eDP-1', '--mode', '1920x1080', '--pos', '0x0', '--primary',
+                          '--output', 'HDMI-1', '--mode', '1920x1080', '--pos', '1920x0', '--output', 'HDMI-2', '--auto'])
+
+    def test_cache(self):
+        ''' Test outputs are only enumerated again after a hotplug '''
+        queries = []
+        cache = outputs.Outputs(lambda: queries.append(True) or XRANDR_QUERY, drm_path=self.drm)
+        self.assertEqual([output.get('name') for output in cache.connected()], ['eDP-1', 'HDMI-1', 'HDMI-2'])
+        self.assertEqual([output.get('name') for output in cache.connected(['HDMI-1', 'DP-1'])], ['HDMI-1'])
+        self.assertEqual(len(queries), 1)
+        self.plug('card0-DP-1', 'connected')
+        cache.connected()
+        self.assertEqual(len(queries), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import prewake
+
+
+def local(year, month, day, hour, minute):
+    ''' Return the timestamp of a local time '''
+    return time.mktime((year, month, day, hour, minute, 0, 0, 0, -1))
+
+
+class TestPrewake(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = tempfile.mkdtemp()
+        self.path = os.path.join(self.profile, 'prewake.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.profile)
+
+    def test_slot_of(self):
+        self.assertEqual(prewake.slot_of(local(2024, 1, 1, 0, 0)), (0, 0))  # A Monday
+        self.assertEqual(prewake.slot_of(local(2024, 1, 7, 23, 59)), (6, prewake.PREWAKE_SLOTS - 1))
+        self.assertEqual(prewake.slot_of(local(2024, 1, 3, 18, 20)), (2, 18 * 4 + 1))
+
+    def test_record(self):
+        ''' Every slot the screensaver was active in is counted once, the wake only in its slot '''
+        patterns = prewake.UsagePatterns(self.path)
+        patterns.record(local(2024, 1, 1, 12, 10), local(2024, 1, 1, 12, 50))
+        self.assertEqual(patterns.active[0][12 * 4:12 * 4 + 5], [1, 1, 1, 1, 0])
+        self.assertEqual(patterns.wakes[0][12 * 4:12 * 4 + 5], [0, 0, 0, 1, 0])
+        self.assertIsNone(patterns.confidence(0, 12 * 4 + 3))  # Too few samples
+
+    def test_next_wake(self):
+        ''' After a few weeks of coming home at 18:05 on Mondays, the display is turned on at 18:00 '''
+        patterns = prewake.UsagePatterns(self.path)
+        for week in range(prewake.PREWAKE_SAMPLES):
+            patterns.record(local(2024, 1, 1 + 7 * week, 17, 0), local(2024, 1, 1 + 7 * week, 18, 5))
+        self.assertEqual(patterns.confidence(0, 18 * 4), 1)
+        self.assertEqual(patterns.confidence(0, 17 * 4), 0)
+        self.assertEqual(patterns.next_wake(local(2024, 1, 29, 17, 2), 0.8), local(2024, 1, 29, 18, 0))
+        self.assertIsNone(patterns.next_wake(local(2024, 1, 30, 17, 2), 0.8))  # Not on Tuesdays
+
+        # Coming home late once makes us less confident
+        patterns.record(local(2024, 1, 29, 17, 0), local(2024, 1, 29, 19, 5))
+        self.assertEqual(patterns.confidence(0, 18 * 4), 0.8)
+        self.assertIsNone(patterns.next_wake(local(2024, 2, 5, 17, 2), 0.9))
+
+    def test_decay(self):
+        ''' Counts are halved when a slot was seen often, so the histogram stays compact and adapts '''
+        patterns = prewake.UsagePatterns(self.path)
+        for week in range(prewake.PREWAKE_MAX_COUNT):
+            timestamp = local(2024, 1, 1 + 7 * week, 18, 5)
+            patterns.record(timestamp - 60, timestamp)
+        self.assertEqual(patterns.active[0][18 * 4], prewake.PREWAKE_MAX_COUNT // 2)
+        self.assertEqual(patterns.wakes[0][18 * 4], prewake.PREWAKE_MAX_COUNT // 2)
+
+    def test_save(self):
+        patterns = prewake.UsagePatterns(self.path)
+        patterns.record(local(2024, 1, 1, 12, 10), local(2024, 1, 1, 12, 50))
+        patterns.outcome('hits', early=30)
+        patterns.outcome('misses')
+        patterns.outcome('unpredicted')
+        patterns.save()
+        with open(self.path) as fdesc:
+            self.assertEqual(json.load(fdesc).get('stats'), dict(hits=1, misses=1, unpredicted=1, early=30))
+        patterns = prewake.UsagePatterns(self.path)
+        self.assertEqual(patterns.wakes[0][12 * 4 + 3], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
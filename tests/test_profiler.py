@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import sys
+import unittest
+from userprofile import ProfileTestCase
+import profiler
+import screensaver
+
+xbmcaddon = __import__('xbmcaddon')
+
+addon = xbmcaddon.Addon()
+
+
+class TestProfiler(ProfileTestCase):
+
+    def test_not_armed(self):
+        ''' Test nothing is profiled when profiling is not armed '''
+        addon.settings['profile'] = 'false'
+        screensaver.TurnOffMonitor().onSettingsChanged()
+        capture = profiler.Profiler()
+        capture.start('activate')
+        self.assertIs(capture.thread(), profiler.NO_SPAN)
+        capture.finish()
+
+    def test_profile_cycle(self):
+        ''' Test a single activation and wake cycle is profiled, after which profiling is disarmed '''
+        addon.settings['display_method'] = '1'
+        addon.settings['power_method'] = '0'
+        addon.settings['profile'] = 'true'
+        addon.settings['profile_memory'] = 'true'
+        screensaver.TurnOffMonitor().onSettingsChanged()
+        turnoff = screensaver.TurnOffDialog('gui.xml', screensaver.addon_path(), 'default')
+        turnoff.onInit()
+        turnoff.resume()
+        self.assertEqual(addon.settings.get('profile'), 'false')
+        self.assertFalse(screensaver.get_settings().profile)
+        files = sorted(name for name in os.listdir(screensaver.addon_profile()) if name.startswith('profile-'))
+        addon.settings['profile_memory'] = 'false'
+        screensaver.TurnOffMonitor().onSettingsChanged()
+        extensions = ['memory.txt', 'prof', 'txt'] if sys.version_info.major > 2 else ['prof', 'txt']
+        for cycle in ('activate', 'wake'):
+            self.assertEqual(sorted(name.split('.', 1)[1] for name in files if name.startswith('profile-' + cycle)), extensions)
+
+    def test_single_profiler(self):
+        ''' Test only one profiler is enabled when the interpreter allows only one, like Python 3.12+ does '''
+        import cProfile
+
+        class Profile(cProfile.Profile):
+            active = []
+
+            def enable(self, *args, **kwargs):
+                if Profile.active:
+                    raise ValueError('Another profiling tool is already active')
+                Profile.active.append(self)
+                return super(Profile, self).enable(*args, **kwargs)
+
+            def disable(self):
+                if self in Profile.active:
+                    Profile.active.remove(self)
+                return super(Profile, self).disable()
+
+        addon.settings['profile'] = 'true'
+        screensaver.TurnOffMonitor().onSettingsChanged()
+        original, cProfile.Profile = cProfile.Profile, Profile
+        try:
+            capture = profiler.Profiler()
+            capture.start('activate')
+            with capture.thread(), capture.thread():  # The second is covered by the first
+                pass
+            self.assertEqual(len(capture.profiles), 1)
+            capture.finish()
+            self.assertTrue(screensaver.get_settings().profile)
+
+            with Profile():  # Someone else is profiling
+                capture.start('wake')
+                with capture.thread():
+                    pass
+            self.assertIsNone(capture.profiles)
+            self.assertEqual(addon.settings.get('profile'), 'false')
+        finally:
+            cProfile.Profile = original
+        self.assertEqual([name for name in os.listdir(screensaver.addon_profile()) if name.startswith('profile-wake')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+import ranking
+import screensaver
+
+
+class TestRanking(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stats = screensaver.DurationStats(os.path.join(self.directory, 'durations.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def session(self, methods, method, off, on, success=True, confirmed=True):
+        ''' Pretend a screensaver session turned the display off and on '''
+        self.stats.add(method, 'off', off)
+        self.stats.add(method, 'on', on)
+        methods.record(method, success, confirmed)
+        methods.record(method, success, confirmed)
+
+    def test_ranking(self):
+        ''' Test every candidate is tried before the fastest reliable one is chosen '''
+        candidates = ['cec-builtin', 'dpms-xset', 'no-signal-rpi']
+        methods = ranking.Ranking(os.path.join(self.directory, 'ranking.json'))
+        latencies = {'cec-builtin': 900, 'dpms-xset': 100, 'no-signal-rpi': 50}
+        for _ in range(ranking.RANKING_TRIALS * len(candidates)):
+            method = methods.choose(candidates, self.stats)
+            self.session(methods, method, latencies[method], latencies[method], success=method != 'no-signal-rpi')
+        self.assertEqual(methods.choose(candidates, self.stats), 'dpms-xset')
+        self.assertEqual(methods.ranking, ['dpms-xset', 'cec-builtin'])
+        methods.save()
+        self.assertEqual(ranking.Ranking(methods.path).ranking, methods.ranking)
+
+        # The ranking is refreshed from observed latencies
+        for _ in range(ranking.RANKING_SESSIONS):
+            self.session(methods, methods.choose(candidates, self.stats), 2000, 2000)
+        self.assertEqual(methods.choose(candidates, self.stats), 'cec-builtin')
+
+        # A method that is no longer usable is not chosen
+        self.assertIsNone(methods.choose(['no-signal-rpi'], self.stats))
+
+    def test_unconfirmed(self):
+        ''' Test a method that cannot report the display state is ranked after one that confirmed it worked '''
+        candidates = ['dpms-x11', 'cec-builtin']
+        methods = ranking.Ranking(os.path.join(self.directory, 'ranking.json'))
+        latencies = {'cec-builtin': 100, 'dpms-x11': 900}
+        for _ in range(ranking.RANKING_TRIALS * len(candidates)):
+            method = methods.choose(candidates, self.stats)
+            self.session(methods, method, latencies[method], latencies[method], confirmed=method != 'cec-builtin')
+        self.assertEqual(methods.choose(candidates, self.stats), 'dpms-x11')
+        self.assertEqual(methods.ranking, ['dpms-x11', 'cec-builtin'])
+
+    def test_fallback(self):
+        ''' Test a method is tried with the best method known to work as its fallback, or else the next one to try '''
+        candidates = ['dpms-x11', 'ddc-ci', 'cec-builtin']
+        methods = ranking.Ranking(os.path.join(self.directory, 'ranking.json'))
+        self.assertEqual(methods.fallback(candidates, 'dpms-x11'), 'ddc-ci')
+        self.session(methods, 'dpms-x11', 100, 100)
+        self.session(methods, 'dpms-x11', 100, 100)
+        self.assertEqual(methods.fallback(candidates, 'ddc-ci'), 'dpms-x11')
+        self.session(methods, 'ddc-ci', 100, 100, success=False)
+        self.session(methods, 'ddc-ci', 100, 100, success=False)
+        self.assertEqual(methods.fallback(candidates, 'cec-builtin'), 'dpms-x11')
+        self.assertEqual(methods.fallback(candidates, 'dpms-x11'), 'cec-builtin')  # Not the method that failed
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import state
+
+
+class TestState(unittest.TestCase):
+
+    def setUp(self):
+        self.profile = tempfile.mkdtemp()
+        self.path = os.path.join(self.profile, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.profile)
+
+    def test_transitions(self):
+        ''' A command is only sent when the device is not already in, or going to, its target state '''
+        devices = state.DeviceState(self.path)
+        self.assertEqual(devices.stale(), [])
+        self.assertFalse(devices.begin('display', 'on'))
+        self.assertTrue(devices.begin('display', 'off'))
+        self.assertEqual(devices.get('display'), 'turning-off')
+        self.assertFalse(devices.begin('display', 'off'))
+        self.assertTrue(devices.begin('display', 'on'))  # Turning on while turning off is not skipped
+        devices.end('display', 'on')
+        self.assertTrue(devices.begin('audio', 'muted'))
+        devices.end('audio', 'muted')
+        self.assertFalse(devices.begin('audio', 'muted'))
+
+    def test_unknown(self):
+        ''' Nothing is skipped when we do not know the state of a device '''
+        devices = state.DeviceState(self.path)
+        devices.end('display', 'unknown')
+        self.assertTrue(devices.begin('display', 'off'))
+        devices.end('display', 'unknown')
+        self.assertTrue(devices.begin('display', 'on'))
+
+    def test_save(self):
+        ''' The state survives the screensaver script, a session that never resumed leaves stale state behind '''
+        devices = state.DeviceState(self.path)
+        devices.begin('display', 'off')
+        devices.end('display', 'off', method='dpms-builtin')
+        devices.begin('audio', 'muted')
+        with open(self.path) as fdesc:
+            self.assertEqual(json.load(fdesc), dict(display='off', audio='unmuted', method='dpms-builtin'))
+        devices = state.DeviceState(self.path)
+        self.assertEqual(devices.method, 'dpms-builtin')
+        self.assertEqual(devices.stale(), ['display'])
+        self.assertFalse(devices.begin('display', 'off'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import wake
+
+SYN = wake.INPUT_EVENT.pack(0, 0, 0x00, 0, 0)
+KEY_PRESS = wake.INPUT_EVENT.pack(0, 0, wake.EV_KEY, 28, 1)
+KEY_RELEASE = wake.INPUT_EVENT.pack(0, 0, wake.EV_KEY, 28, 0)
+MOUSE_MOVE = wake.INPUT_EVENT.pack(0, 0, wake.EV_REL, 0, 5)
+
+
+class FakeInputDevices(object):
+    ''' Input devices in a temporary directory, as FIFOs we can write events to '''
+
+    def __init__(self, count):
+        self.directory = tempfile.mkdtemp()
+        self.paths = [os.path.join(self.directory, 'event%d' % index) for index in range(count)]
+        self.writers = []
+        for path in self.paths:
+            os.mkfifo(path)
+            self.writers.append(os.open(path, os.O_RDWR))  # Keeps the FIFO open, like a device that is plugged in
+
+    def send(self, index, *events):
+        os.write(self.writers[index], b''.join(events))
+
+    def close(self):
+        for fd in self.writers:
+            os.close(fd)
+        shutil.rmtree(self.directory)
+
+
+@unittest.skipUnless(hasattr(os, 'mkfifo'), 'Requires FIFOs')
+class TestWake(unittest.TestCase):
+
+    def setUp(self):
+        self.devices = FakeInputDevices(2)
+        self.woken = threading.Event()
+        self.calls = []
+
+    def tearDown(self):
+        self.devices.close()
+
+    def callback(self):
+        self.calls.append(threading.current_thread().name)
+        self.woken.set()
+
+    def test_wake_event(self):
+        self.assertTrue(wake.wake_event(SYN + KEY_PRESS + SYN))
+        self.assertTrue(wake.wake_event(MOUSE_MOVE))
+        self.assertFalse(wake.wake_event(KEY_RELEASE + SYN))
+        self.assertFalse(wake.wake_event(KEY_PRESS[:-1]))  # Incomplete events are ignored
+
+    def test_first_event(self):
+        ''' The first input event on any device calls back once, later events are ignored '''
+        listener = wake.WakeListener(self.callback, self.devices.paths)
+        self.assertTrue(listener.start())
+        self.devices.send(1, KEY_RELEASE, SYN)
+        self.assertFalse(self.woken.wait(0.2))
+        self.devices.send(1, KEY_PRESS, SYN)
+        self.devices.send(0, KEY_PRESS, SYN)
+        self.assertTrue(self.woken.wait(5))
+        listener.thread.join(5)
+        self.assertFalse(listener.thread.is_alive())
+        self.assertEqual(listener.fds, [])
+        listener.stop()  # Kodi deactivates the screensaver afterwards
+        self.assertEqual(self.calls, ['wake'])
+
+    def test_stop(self):
+        ''' A stopped listener does not call back '''
+        listener = wake.WakeListener(self.callback, self.devices.paths)
+        listener.start()
+        listener.stop()
+        listener.thread.join(5)
+        self.assertFalse(listener.thread.is_alive())
+        self.assertEqual(self.calls, [])
+
+    def test_no_devices(self):
+        listener = wake.WakeListener(self.callback, [os.path.join(self.devices.directory, 'missing')])
+        self.assertFalse(listener.start())
+        listener.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import subprocess
+import time
+import unittest
+import xdpms
+
+try:  # Python 3
+    from shutil import which
+except ImportError:  # Python 2
+    from distutils.spawn import find_executable as which  # pylint: disable=deprecated-module
+
+
+@unittest.skipUnless(which('Xvfb'), 'This requires Xvfb')
+class TestXDpms(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.xvfb = subprocess.Popen(['Xvfb', ':99', '-nolisten', 'tcp', '+extension', 'DPMS'])
+        time.sleep(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.xvfb.terminate()
+        cls.xvfb.wait()
+
+    def test_dpms(self):
+        ''' Test forcing and querying DPMS modes over a single connection '''
+        display = xdpms.XDisplay(':99')
+        try:
+            display.force_level('off')
+            self.assertEqual(display.power_level(), 'off')
+            display.force_level('on')
+            self.assertEqual(display.power_level(), 'on')
+        finally:
+            display.close()
+
+    def test_no_display(self):
+        ''' Test a missing X server raises OSError '''
+        with self.assertRaises(OSError):
+            xdpms.XDisplay(':98')
+
+
+if __name__ == '__main__':
+    unittest.main()
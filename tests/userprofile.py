@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2019, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v3.0 (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+''' Run every test against an empty add-on profile, so results never depend on what earlier runs left behind '''
+
+# pylint: disable=invalid-name,missing-docstring
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+import shutil
+import tempfile
+import unittest
+import kodiutils
+import screensaver
+
+# The cached functions that read from or write to the add-on profile
+PROFILE_CACHES = (kodiutils.addon_profile, screensaver.capabilities, screensaver.device_state, screensaver.duration_stats,
+                  screensaver.method_ranking, screensaver.usage_patterns)
+
+
+def forget_profile():
+    ''' Drop everything that was loaded from the add-on profile '''
+    for function in PROFILE_CACHES:
+        if hasattr(function, 'cached'):
+            del function.cached
+
+
+class ProfileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        forget_profile()
+        self.profile = tempfile.mkdtemp()
+        kodiutils.addon_profile.cached = self.profile
+
+    def tearDown(self):
+        forget_profile()
+        shutil.rmtree(self.profile)
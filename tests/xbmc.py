@@ -35,6 +35,13 @@ REGIONS = {
 
 settings = global_settings()
 
+# Latency (in seconds) injected into calls to Kodi, e.g. to benchmark the screensaver
+LATENCY = dict(executebuiltin=0, executeJSONRPC=0)
+
+# JSON-RPC methods that only have to succeed
+JSONRPC_OK = ('Application.SetMute', 'GUI.ActivateWindow', 'JSONRPC.NotifyAll', 'Application.Quit',
+              'System.Hibernate', 'System.Powerdown', 'System.Reboot', 'System.Shutdown', 'System.Suspend')
+
 
 class Keyboard(object):
     ''' A stub implementation of the xbmc Keyboard class '''
@@ -166,30 +173,41 @@ class VideoInfoTag(object):
 
 def executebuiltin(string, wait=False):  # pylint: disable=unused-argument
     ''' A stub implementation of the xbmc executebuiltin() function '''
-    return
+    time.sleep(LATENCY.get('executebuiltin'))
 
 
 def executeJSONRPC(jsonrpccommand):
     ''' A reimplementation of the xbmc executeJSONRPC() function '''
     command = json.loads(jsonrpccommand)
+    time.sleep(LATENCY.get('executeJSONRPC'))
+    if isinstance(command, list):
+        return json.dumps([jsonrpc_response(cmd) for cmd in command])
+    return json.dumps(jsonrpc_response(command))
+
+
+def jsonrpc_response(command):
+    ''' Return the response to a single JSON-RPC request '''
     if command.get('method') == 'Settings.GetSettingValue':
         key = command.get('params').get('setting')
-        return json.dumps(dict(id=1, jsonrpc='2.0', result=dict(value=settings.get(key))))
+        return dict(id=command.get('id'), jsonrpc='2.0', result=dict(value=settings.get(key)))
     if command.get('method') == 'Addons.GetAddonDetails':
         if command.get('params', {}).get('addonid') == 'script.module.inputstreamhelper':
-            return json.dumps(dict(id=1, jsonrpc='2.0', result=dict(addon=dict(enabled='true', version='0.3.5'))))
-        return json.dumps(dict(id=1, jsonrpc='2.0', result=dict(addon=dict(enabled='true', version='1.2.3'))))
+            return dict(id=command.get('id'), jsonrpc='2.0', result=dict(addon=dict(enabled='true', version='0.3.5')))
+        return dict(id=command.get('id'), jsonrpc='2.0', result=dict(addon=dict(enabled='true', version='1.2.3')))
     if command.get('method') == 'Textures.GetTextures':
-        return json.dumps(dict(id=1, jsonrpc='2.0', result=dict(textures=[dict(cachedurl="", imagehash="", lasthashcheck="", textureid=4837, url="")])))
+        textures = [dict(cachedurl="", imagehash="", lasthashcheck="", textureid=4837, url="")]
+        return dict(id=command.get('id'), jsonrpc='2.0', result=dict(textures=textures))
     if command.get('method') == 'Textures.RemoveTexture':
-        return json.dumps(dict(id=1, jsonrpc='2.0', result="OK"))
+        return dict(id=command.get('id'), jsonrpc='2.0', result="OK")
+    if command.get('method') in JSONRPC_OK:
+        return dict(id=command.get('id'), jsonrpc='2.0', result='OK')
     log("executeJSONRPC does not implement method '{method}'".format(**command), LOGERROR)
-    return json.dumps(dict(error=dict(code=-1, message='Not implemented'), id=1, jsonrpc='2.0'))
+    return dict(error=dict(code=-1, message='Not implemented'), id=command.get('id'), jsonrpc='2.0')
 
 
 def getCondVisibility(string):  # pylint: disable=unused-argument
     ''' A reimplementation of the xbmc getCondVisibility() function '''
-    if string == 'system.platform.android':
+    if string in ('Player.HasMedia', 'system.platform.android'):
         return False
     if string.startswith('System.HasAddon'):
         return True
@@ -9,6 +9,9 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import sys
 from xbmcextra import kodi_to_ansi
 
+# Window properties are shared by all Window objects with the same id
+WINDOW_PROPERTIES = {}
+
 
 class Control(object):
     ''' A reimplementation of the xbmcgui Control class '''
@@ -266,10 +269,11 @@ class Window(object):
 
     def __init__(self, existingWindowId=-1):
         ''' A stub constructor for the xbmcgui Window class '''
-        return None
+        self.properties = WINDOW_PROPERTIES.setdefault(existingWindowId, {})
 
-    def clearProperty(self):
-        ''' A stub implementation for the xbmcgui Window class clearProperty() method '''
+    def clearProperty(self, key):
+        ''' A working implementation for the xbmcgui Window class clearProperty() method '''
+        self.properties.pop(key, None)
 
     def close(self):
         ''' A stub implementation for the xbmcgui Window class close() method '''
@@ -284,15 +288,13 @@ class Window(object):
         ''' A stub implementation for the xbmcgui Window class getFocusId() method '''
         return 0
 
-    @staticmethod
-    def getProperty():
-        ''' A stub implementation for the xbmcgui Window class getProperty() method '''
-        return ''
+    def getProperty(self, key):
+        ''' A working implementation for the xbmcgui Window class getProperty() method '''
+        return self.properties.get(key, '')
 
-    @staticmethod
-    def setProperty(key, value):
-        ''' A stub implementation for the xbmcgui Window class setProperty() method '''
-        return
+    def setProperty(self, key, value):
+        ''' A working implementation for the xbmcgui Window class setProperty() method '''
+        self.properties[key] = value
 
     def show(self):
         ''' A stub implementation for the xbmcgui Window class show() method '''
@@ -314,7 +316,9 @@ class WindowXMLDialog(WindowXML, object):
         super(WindowXMLDialog, self).__init__(xmlFilename, scriptPath, defaultSkin, defaultRes)
 
     def doModal(self):
-        ''' A stub implementation for the xbmc Monitor class doModal method '''
+        ''' A stub implementation for the xbmcgui WindowXMLDialog class doModal() method '''
+        if hasattr(self, 'onInit'):
+            self.onInit()
 
 
 def getCurrentWindowId():
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Listen to the raw input devices while the display is off, to start turning it back on at the very first input event
+
+Kodi only deactivates the screensaver after it processed the key press, listening to the evdev devices ourselves
+gains that time. Remote controls using kernel CEC or IR show up as evdev devices as well.
+'''
+
+from __future__ import absolute_import, division, unicode_literals
+import os
+import struct
+from kodiutils import log
+
+# The evdev input devices
+INPUT_DEVICES = '/dev/input/event*'
+
+# struct input_event, see include/uapi/linux/input.h
+INPUT_EVENT = struct.Struct(str('llHHi'))
+
+# Event types that mean someone is there, see include/uapi/linux/input-event-codes.h
+EV_KEY = 0x01
+EV_REL = 0x02
+EV_ABS = 0x03
+WAKE_EVENTS = (EV_KEY, EV_REL, EV_ABS)
+
+
+def wake_event(data):
+    ''' Return whether a chunk of raw input events contains one that should wake up the display '''
+    for offset in range(0, len(data) - INPUT_EVENT.size + 1, INPUT_EVENT.size):
+        _, _, event_type, _, value = INPUT_EVENT.unpack_from(data, offset)
+        if event_type in WAKE_EVENTS and not (event_type == EV_KEY and value == 0):  # Key releases follow a press we missed
+            return True
+    return False
+
+
+class WakeListener(object):
+    ''' Wait for the first input event on any input device in a thread, and call back once '''
+
+    def __init__(self, callback, paths=None):
+        ''' Initialize listener, defaults to all evdev devices we are allowed to read '''
+        from threading import Lock, Thread
+        self.callback = callback
+        self.lock = Lock()
+        self.fds = []
+        for path in paths if paths is not None else self.devices():
+            try:
+                self.fds.append(os.open(path, os.O_RDONLY | os.O_NONBLOCK | getattr(os, 'O_CLOEXEC', 0)))
+            except OSError as exc:
+                log(3, "Cannot listen to input device '{path}': {exc}", path=path, exc=exc)
+        self.stop_reader, self.stop_writer = os.pipe()
+        self.thread = Thread(target=self.listen, name='wake')
+        self.thread.daemon = True
+
+    @staticmethod
+    def devices():
+        ''' Return the evdev devices '''
+        from glob import glob
+        return sorted(glob(INPUT_DEVICES))
+
+    def start(self):
+        ''' Start listening, returns whether there is anything to listen to '''
+        if not self.fds:
+            log(2, 'No input devices to listen to')
+            self.close()
+            return False
+        log(2, 'Listening to {count} input devices', count=len(self.fds))
+        self.thread.start()
+        return True
+
+    def listen(self):
+        ''' Wait until an input event wakes us up, or we are stopped '''
+        from select import select
+        fds = list(self.fds)
+        try:
+            while fds:
+                readable = select(fds + [self.stop_reader], [], [])[0]
+                if self.stop_reader in readable:
+                    return
+                for fd in readable:
+                    try:
+                        data = os.read(fd, INPUT_EVENT.size * 64)
+                    except OSError:  # E.g. the device was unplugged
+                        data = b''
+                    if not data:
+                        fds.remove(fd)
+                    elif wake_event(data):
+                        log(2, 'Input event, waking up')
+                        self.callback()
+                        return
+        finally:
+            self.close()
+
+    def stop(self):
+        ''' Stop listening without calling back, the thread closes the input devices '''
+        with self.lock:
+            if self.stop_writer != -1:
+                os.write(self.stop_writer, b'x')
+
+    def close(self):
+        ''' Close all input devices '''
+        with self.lock:
+            for fd in self.fds + [self.stop_reader, self.stop_writer]:
+                if fd != -1:
+                    os.close(fd)
+            self.fds = []
+            self.stop_reader = self.stop_writer = -1
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Copyright: (c) 2018, Dag Wieers (@dagwieers) <dag@wieers.com>
+# GNU General Public License v2.0 (see COPYING or https://www.gnu.org/licenses/gpl-2.0.txt)
+''' Control the display using the X11 DPMS extension, without spawning xset '''
+
+from __future__ import absolute_import, division, unicode_literals
+from ctypes import CDLL, POINTER, byref, c_char_p, c_int, c_ubyte, c_ushort, c_void_p
+from ctypes.util import find_library
+
+# DPMS power levels, see X11/extensions/dpmsconst.h
+DPMS_MODE_ON = 0
+DPMS_MODE_STANDBY = 1
+DPMS_MODE_SUSPEND = 2
+DPMS_MODE_OFF = 3
+
+DPMS_MODES = dict(on=DPMS_MODE_ON, standby=DPMS_MODE_STANDBY, suspend=DPMS_MODE_SUSPEND, off=DPMS_MODE_OFF)
+
+
+def load_library(name):
+    ''' Load a shared library by its short name '''
+    path = find_library(name)
+    if path is None:
+        raise OSError("Library '%s' is not available" % name)
+    return CDLL(path)
+
+
+class XDisplay(object):
+    ''' A connection to the X server that is kept open for the whole screensaver session '''
+
+    def __init__(self, name=None):
+        ''' Open the display (defaults to $DISPLAY) and check it supports DPMS '''
+        from threading import Lock
+        # The display is used from several threads, but XInitThreads() cannot be called this late in Kodi's process
+        self.lock = Lock()
+        self.xlib = load_library('X11')
+        self.xext = load_library('Xext')
+
+        self.xlib.XOpenDisplay.argtypes = [c_char_p]
+        self.xlib.XOpenDisplay.restype = c_void_p
+        self.xlib.XCloseDisplay.argtypes = [c_void_p]
+        self.xlib.XFlush.argtypes = [c_void_p]
+        self.xext.DPMSCapable.argtypes = [c_void_p]
+        self.xext.DPMSEnable.argtypes = [c_void_p]
+        self.xext.DPMSForceLevel.argtypes = [c_void_p, c_ushort]
+        self.xext.DPMSInfo.argtypes = [c_void_p, POINTER(c_ushort), POINTER(c_ubyte)]
+        self.xext.DPMSQueryExtension.argtypes = [c_void_p, POINTER(c_int), POINTER(c_int)]
+
+        self.display = self.xlib.XOpenDisplay(name.encode() if name else None)
+        if not self.display:
+            raise OSError("Cannot open display '%s'" % (name or '$DISPLAY'))
+        event_base, error_base = c_int(), c_int()
+        if not self.xext.DPMSQueryExtension(self.display, byref(event_base), byref(error_base)) or not self.xext.DPMSCapable(self.display):
+            self.close()
+            raise OSError('X server does not support DPMS')
+
+    def force_level(self, mode):
+        ''' Force the display into a DPMS mode, e.g. 'off' or 'on' '''
+        with self.lock:
+            # DPMSForceLevel() is ignored unless DPMS is enabled
+            self.xext.DPMSEnable(self.display)
+            self.xext.DPMSForceLevel(self.display, DPMS_MODES.get(mode))
+            self.xlib.XFlush(self.display)
+
+    def power_level(self):
+        ''' Return the current DPMS mode, e.g. 'off' or 'on' '''
+        level, enabled = c_ushort(), c_ubyte()
+        with self.lock:
+            self.xext.DPMSInfo(self.display, byref(level), byref(enabled))
+        if not enabled.value:  # The display cannot be turned off when DPMS is disabled
+            return 'on'
+        return next((mode for mode, value in DPMS_MODES.items() if value == level.value), None)
+
+    def close(self):
+        ''' Close the connection to the X server '''
+        with self.lock:
+            if self.display:
+                self.xlib.XCloseDisplay(self.display)
+                self.display = None